@@ -1,17 +1,57 @@
+import argparse
+import array
 import csv
 import numpy as np
 import sys
 import time
 import os
-import matplotlib.pyplot as plt
 import math
 import json
+import glob
+import hashlib
+import io
+import itertools
+import ctypes
+import ctypes.util
+import select
+import struct
+import contextlib
+import collections
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
 from typing import Optional, List
 
+# FILES
+
+
+@contextlib.contextmanager
+def atomic_write(file_path: str, mode: str = 'w', **kwargs):
+    """Open a temporary file next to file_path, renamed to file_path once completely written.
+
+    Readers of file_path (the watcher, spreadsheet tools) never see a half-written file, and
+    the content is flushed to disk before the rename so a crash cannot leave an empty file.
+    The temporary file is removed if writing fails.
+    """
+    directory, name = os.path.split(file_path)
+    temp_path = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+    try:
+        with open(temp_path, mode, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temp_path)
+        raise
+
 # QUESTIONS
 
 
 class Question:
+    # No per-instance __dict__: evaluations may have hundreds of questions
+    __slots__ = ('part', 'title', 'points', 'coefficient')
+
     def __init__(self, part: str, title: str, points: float, coefficient: float):
         self.part = part
         self.title = title
@@ -38,17 +78,36 @@ def read_questions_from_csv(file_path: str):
 class Evaluation:
     def __init__(self, name: str, questions: list[Question]):
         self.name = name
+        self.set_questions(questions)
+
+    def set_questions(self, questions: list[Question]):
+        """Replace the questions and rebuild the UID lookup tables."""
         self.questions = questions
+        # UIDs are 1-based question numbers (Q1, Q2, ...), in questions order
+        self.question_uids = [f"Q{i + 1}" for i in range(len(questions))]
+        self.uid_to_index = {uid: i for i, uid in enumerate(self.question_uids)}
+        # Points and coefficients of all questions, in questions order
+        self.points = np.array([question.points for question in questions], dtype=np.float64)
+        self.coefficients = np.array([question.coefficient for question in questions], dtype=np.float64)
+        # Parts in order of first appearance, and the part (index in parts) of each question
+        self.parts = list(dict.fromkeys(question.part for question in questions))
+        part_index = {part: p for p, part in enumerate(self.parts)}
+        self.part_ids = np.array([part_index[question.part] for question in questions], dtype=np.intp)
 
     def __repr__(self):
         return f"Evaluation(name='{self.name}', questions={self.questions})"
 
     def get_question_uid(self, question_number: int):
         if 0 <= question_number < len(self.questions):
-            return f"Q{question_number + 1}"
+            return self.question_uids[question_number]
         else:
             raise ValueError("Invalid question number")
 
+    def active_question_indices(self, dropped_questions):
+        """Indices (0-based) of the questions that are not in dropped_questions (1-based numbers)."""
+        dropped = set(dropped_questions)
+        return [i for i in range(len(self.questions)) if (i + 1) not in dropped]
+
     @classmethod
     def from_csv(cls, name: str, file_path: str):
         questions = read_questions_from_csv(file_path)
@@ -56,7 +115,7 @@ class Evaluation:
 
     def write_to_csv(self, file_path: str):
         """Write the questions to a CSV file."""
-        with open(file_path, mode='w', newline='', encoding='utf-8') as csvfile:
+        with atomic_write(file_path, newline='', encoding='utf-8') as csvfile:
             fieldnames = ['part', 'name', 'points', 'coefficient']
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
@@ -71,7 +130,7 @@ class Evaluation:
     @staticmethod
     def create_sample_evaluation(file_path: str):
         sample_evaluation = [Question("Part 1", "Sample Question", 10.0, 1.0)]
-        with open(file_path, mode='w', newline='', encoding='utf-8') as csvfile:
+        with atomic_write(file_path, newline='', encoding='utf-8') as csvfile:
             fieldnames = ['part', 'name', 'points', 'coefficient']
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
@@ -88,6 +147,9 @@ class Evaluation:
 
 
 class Student:
+    # No per-instance __dict__: rosters may have 100k+ students
+    __slots__ = ('last_name', 'first_name', 'email')
+
     def __init__(self, last_name: str, first_name: str, email: str):
         self.last_name = last_name
         self.first_name = first_name
@@ -100,11 +162,18 @@ class Student:
 def read_students_from_csv(file_path: str):
     students = []
     with open(file_path, mode='r', newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
+        reader = csv.reader(csvfile)
+        # Look the columns up once instead of building a dict per row (like csv.DictReader)
+        header = next(reader, [])
+        columns = []
+        for name in ('last name', 'first name', 'email'):
+            if name not in header:
+                raise ValueError(f"No '{name}' column in the roster {file_path}")
+            columns.append(header.index(name))
         for row in reader:
-            last_name = row['last name']
-            first_name = row['first name']
-            email = row['email']
+            if not row:
+                continue
+            last_name, first_name, email = (row[column] if column < len(row) else None for column in columns)
             students.append(Student(last_name, first_name, email))
     return students
 
@@ -112,25 +181,35 @@ def read_students_from_csv(file_path: str):
 class Class:
     def __init__(self, name: str):
         self.name = name
-        self.students = []
+        self.set_students([])
+
+    def set_students(self, students: list[Student]):
+        """Replace the students and rebuild the email lookup table."""
+        self.students = students
+        # Index in students of the first student with each email
+        self.email_index = {}
+        for i, student in enumerate(students):
+            self.email_index.setdefault(student.email, i)
 
     def add_student(self, student: Student):
+        self.email_index.setdefault(student.email, len(self.students))
         self.students.append(student)
 
+    def has_student(self, email: str):
+        return email in self.email_index
+
     def __repr__(self):
         return f"Class(name='{self.name}', students={self.students})"
 
     @classmethod
     def from_csv(cls, name: str, file_path: str):
         new_class = cls(name)
-        students = read_students_from_csv(file_path)
-        for student in students:
-            new_class.add_student(student)
+        new_class.set_students(read_students_from_csv(file_path))
         return new_class
 
     def write_to_csv(self, file_path: str):
         """Write the roster (students) to a CSV file."""
-        with open(file_path, mode='w', newline='', encoding='utf-8') as csvfile:
+        with atomic_write(file_path, newline='', encoding='utf-8') as csvfile:
             fieldnames = ['last name', 'first name', 'email']
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
@@ -146,7 +225,7 @@ class Class:
         sample_class = Class("Sample Class")
         sample_class.add_student(
             Student("Lemer", "Olivier", "olivier.lemer@example.com"))
-        with open(file_path, mode='w', newline='', encoding='utf-8') as csvfile:
+        with atomic_write(file_path, newline='', encoding='utf-8') as csvfile:
             fieldnames = ['last name', 'first name', 'email']
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
@@ -161,39 +240,118 @@ class Class:
 # SETTINGS
 
 
+class ImportPolicy:
+    """How online imports handle the cases where they would otherwise prompt the user.
+
+    'ask' prompts; any other value decides in advance, so that imports can run unattended.
+    """
+    # Students of the export that are not in the roster
+    UNKNOWN_STUDENTS = ('ask', 'ignore', 'add', 'override')
+    # No results.csv yet, or the export has a different number of questions: 'default' names
+    # the questions "Question <n>" worth 1 point, 'fail' aborts the import
+    QUESTION_MISMATCH = ('ask', 'default', 'fail')
+    # Added students whose email is not 'first.last@...': 'email' uses the local part as
+    # first name, 'empty' leaves both names empty
+    MISSING_NAMES = ('ask', 'empty', 'email')
+    # Students found on several lines (of one or several exports): keep the 'latest' line
+    # (later files and lines win), or the 'max' or 'sum' of their scores for each question
+    MERGE = ('latest', 'max', 'sum')
+
+    def __init__(self, unknown_students: str = 'ask', question_mismatch: str = 'ask', missing_names: str = 'ask', merge: str = 'latest'):
+        for name, value, allowed in [('unknown_students', unknown_students, self.UNKNOWN_STUDENTS),
+                                     ('question_mismatch', question_mismatch, self.QUESTION_MISMATCH),
+                                     ('missing_names', missing_names, self.MISSING_NAMES),
+                                     ('merge', merge, self.MERGE)]:
+            if value not in allowed:
+                raise ValueError(f"Invalid import policy {name}: '{value}' (expected one of {', '.join(allowed)})")
+        self.unknown_students = unknown_students
+        self.question_mismatch = question_mismatch
+        self.missing_names = missing_names
+        self.merge = merge
+
+    def __repr__(self):
+        return f"ImportPolicy(unknown_students='{self.unknown_students}', question_mismatch='{self.question_mismatch}', missing_names='{self.missing_names}', merge='{self.merge}')"
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(
+            unknown_students=data.get('unknown_students', 'ask'),
+            question_mismatch=data.get('question_mismatch', 'ask'),
+            missing_names=data.get('missing_names', 'ask'),
+            merge=data.get('merge', 'latest')
+        )
+
+    def to_dict(self):
+        return {
+            'unknown_students': self.unknown_students,
+            'question_mismatch': self.question_mismatch,
+            'missing_names': self.missing_names,
+            'merge': self.merge
+        }
+
+    def non_interactive(self):
+        """A copy where 'ask' is replaced by safe unattended choices: ignore unknown students,
+        fail on question mismatches and leave missing names empty."""
+        return ImportPolicy(
+            unknown_students='ignore' if self.unknown_students == 'ask' else self.unknown_students,
+            question_mismatch='fail' if self.question_mismatch == 'ask' else self.question_mismatch,
+            missing_names='empty' if self.missing_names == 'ask' else self.missing_names,
+            merge=self.merge
+        )
+
+
 class GlobalSettings:
-    def __init__(self, bonus_points: float = 0.0, added_points: float = 0.0, dropped_questions: Optional[List[int]] = None, given_questions: Optional[List[int]] = None):
+    def __init__(self, bonus_points: float = 0.0, added_points: float = 0.0, dropped_questions: Optional[List[int]] = None, given_questions: Optional[List[int]] = None, import_policy: Optional[ImportPolicy] = None, memory_mapped_scores: bool = False, max_labeled_students: int = 300):
         self.bonus_points = bonus_points
         self.added_points = added_points
         # Lists of question numbers (1-based) that are dropped or given
         self.dropped_questions = dropped_questions or []
         self.given_questions = given_questions or []
+        # How online imports resolve unknown students, question mismatches and missing names
+        self.import_policy = import_policy or ImportPolicy()
+        # Keep the score matrix in a memory-mapped file of the grading folder (for very large classes)
+        self.memory_mapped_scores = memory_mapped_scores
+        # Above this class size, the individual plots list the grades on separate pages
+        # instead of labelling every student next to the overall statistics
+        self.max_labeled_students = max_labeled_students
 
     def __repr__(self):
-        return f"GlobalSettings(bonus={self.bonus_points}, added={self.added_points}, dropped={self.dropped_questions}, given={self.given_questions})"
+        return f"GlobalSettings(bonus={self.bonus_points}, added={self.added_points}, dropped={self.dropped_questions}, given={self.given_questions}, import={self.import_policy}, memory_mapped={self.memory_mapped_scores}, max_labeled={self.max_labeled_students})"
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(
+            bonus_points=data.get('bonus_points', 0.0),
+            added_points=data.get('added_points', 0.0),
+            dropped_questions=data.get('dropped_questions', []),
+            given_questions=data.get('given_questions', []),
+            import_policy=ImportPolicy.from_dict(data.get('import', {})),
+            memory_mapped_scores=data.get('memory_mapped_scores', False),
+            max_labeled_students=data.get('max_labeled_students', 300)
+        )
+
+    def to_dict(self):
+        return {
+            'bonus_points': self.bonus_points,
+            'added_points': self.added_points,
+            'dropped_questions': self.dropped_questions,
+            'given_questions': self.given_questions,
+            'import': self.import_policy.to_dict(),
+            'memory_mapped_scores': self.memory_mapped_scores,
+            'max_labeled_students': self.max_labeled_students
+        }
 
     @classmethod
     def from_json(cls, file_path: str):
         if os.path.exists(file_path):
             with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return cls(
-                    bonus_points=data.get('bonus_points', 0.0),
-                    added_points=data.get('added_points', 0.0),
-                    dropped_questions=data.get('dropped_questions', []),
-                    given_questions=data.get('given_questions', [])
-                )
+                return cls.from_dict(json.load(f))
         else:
             return cls()
 
     def to_json(self, file_path: str):
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump({
-                'bonus_points': self.bonus_points,
-                'added_points': self.added_points,
-                'dropped_questions': self.dropped_questions,
-                'given_questions': self.given_questions
-            }, f, indent=4)
+        with atomic_write(file_path, encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=4)
 
 
 # Define a default instance of GlobalSettings as a class-level attribute
@@ -208,6 +366,22 @@ PRIMARY_COLOR = 'gray'
 SECONDARY_COLOR = 'gray'
 TERNARY_COLOR = 'lightgray'
 
+# Layout of the pages listing the grades of large classes (see Results.plot_grade_list)
+GRADE_LIST_COLUMNS = 4
+GRADE_LIST_ROWS = 70
+
+
+def import_pyplot():
+    """Import matplotlib.pyplot on first use, with the non-interactive Agg backend.
+
+    Plotting is only needed to render the PDFs, so commands that only import or
+    validate files do not pay for importing matplotlib.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
 
 def round_up(x, digits):
     """Round a number up to the nearest multiple of 0.5."""
@@ -220,45 +394,475 @@ assert (round_up(1.15, 1) == 1.2)
 assert (round_up(1.19, 1) == 1.2)
 
 
+def round_up_array(x, digits):
+    """Vectorized round_up over a NumPy array."""
+    return np.ceil(x * (10 ** digits)) / (10 ** digits)
+
+
+assert (round_up_array(np.array([1.1, 1.11, 1.15, 1.19]), 1).tolist() == [1.1, 1.2, 1.2, 1.2])
+
+
+# Number of matrix values (rows x columns) processed at once by the statistics of a
+# memory-mapped matrix, which bounds the size of their temporary arrays
+STATISTICS_BLOCK = 1 << 20
+
+# Number of matrix rows read at once by the passes over whole rows (weighted sums, filling),
+# so that a memory-mapped matrix is read sequentially, one block of rows at a time
+ROW_BLOCK = 4096
+
+# Rows of the statistics tables (see row_statistics)
+STATISTICS = ('min', 'q1', 'median', 'q3', 'max', 'mean')
+
+
+def row_statistics(values):
+    """Min, Q1, median, Q3 and max (sorting each row once) and mean of each row of a 2D array.
+
+    Returns a table with one row per statistic (see STATISTICS) and one column per row of
+    values. Quartiles are interpolated linearly like np.percentile, and the median of an even
+    number of values is the mean of the two middle ones like np.median.
+    """
+    if values.shape[1] == 0:
+        return np.zeros((len(STATISTICS), values.shape[0]))
+    # Row by row: numpy may sum the rows of a 2D array in another order than a single row,
+    # and means end up in the stats CSV
+    means = np.array([row.mean() for row in values])
+    return sorted_row_statistics(np.sort(values, axis=1), means)
+
+
+def sorted_row_statistics(values, means):
+    """Statistics table (see row_statistics) of the rows of a 2D array that are already sorted."""
+    count = values.shape[1]
+    if count == 0:
+        return np.zeros((len(STATISTICS), values.shape[0]))
+
+    def quantile(q):
+        position = q * (count - 1)
+        below = int(position)
+        fraction = position - below
+        if fraction == 0:
+            return values[:, below]
+        low, high = values[:, below], values[:, below + 1]
+        # Interpolate from the closest value, so that the result stays between low and high
+        return low + (high - low) * fraction if fraction < 0.5 else high - (high - low) * (1 - fraction)
+
+    middle = count // 2
+    median = values[:, middle] if count % 2 else (values[:, middle - 1] + values[:, middle]) / 2
+    return np.stack([values[:, 0], quantile(0.25), median, quantile(0.75), values[:, -1], means])
+
+
+assert (row_statistics(np.array([[1.0, 4.0, 2.0, 3.0]]))[:, 0].tolist() == [1.0, 1.75, 2.5, 3.25, 4.0, 2.5])
+
+
+def weighted_group_sums(values, weights, group_ids, group_count: int):
+    """Sums of values * weights over the columns of each group (group_ids gives the group of
+    each column), for every row of values: a (rows x group_count) array.
+
+    Columns are added one at a time and in order, so the sums of a row do not depend on the
+    other rows (unlike a matrix product, whose rounding depends on the shape): a few changed
+    rows can be recomputed alone. Values are read ROW_BLOCK rows at a time.
+    """
+    sums = np.zeros((values.shape[0], group_count))
+    columns = list(enumerate(zip(weights.tolist(), group_ids.tolist())))
+    for start in range(0, values.shape[0], ROW_BLOCK):
+        block = np.asarray(values[start:start + ROW_BLOCK])
+        block_sums = sums[start:start + ROW_BLOCK]
+        for column, (weight, group) in columns:
+            block_sums[:, group] += block[:, column] * weight
+    return sums
+
+
+def write_rows(array, rows, values):
+    """Write the rows of a cached array (read-only for its callers) in place."""
+    array.setflags(write=True)
+    array[rows] = values
+    array.setflags(write=False)
+
+
+class SortedColumns:
+    """Each column of a 2D array kept sorted, with its mean, while values of the array change.
+
+    Replacing a value finds its old and new positions by binary search and shifts the values
+    in between, so the order statistics of a column (see sorted_row_statistics) are updated in
+    O(log N) plus one memory move instead of sorting the column again.
+    """
+
+    def __init__(self, values):
+        # One contiguous sorted row per column
+        columns = np.ascontiguousarray(values.T)
+        self.sorted = np.sort(columns, axis=1)
+        self.means = np.array([column.mean() for column in columns])
+
+    def replace(self, column: int, old: float, new: float):
+        values = self.sorted[column]
+        i = int(np.searchsorted(values, old))
+        j = int(np.searchsorted(values, new))
+        if j > i:
+            # Shift the values between old and new one step down
+            values[i:j - 1] = values[i + 1:j]
+            values[j - 1] = new
+        else:
+            values[j + 1:i + 1] = values[j:i]
+            values[j] = new
+
+    def update(self, previous, current, column_values):
+        """Replace the values previous by current (both changed rows x columns).
+
+        column_values(j) returns all the new values of column j, whose mean is recomputed
+        (exactly like for a new SortedColumns) if some of its values changed.
+        """
+        for column in np.flatnonzero((previous != current).any(axis=0)).tolist():
+            for old, new in zip(previous[:, column].tolist(), current[:, column].tolist()):
+                if old != new:
+                    self.replace(column, old, new)
+            self.means[column] = np.ascontiguousarray(column_values(column)).mean()
+
+    def statistics(self):
+        return sorted_row_statistics(self.sorted, self.means)
+
+
+assert (SortedColumns(np.array([[3.0], [1.0], [2.0]])).sorted.tolist() == [[1.0, 2.0, 3.0]])
+
+
+# A cached results CSV modified less than this before its cache was written may have been
+# modified again within the same timestamp (filesystems with coarse timestamps): its content
+# is checked (like git's racily clean index entries)
+RACY_CACHE_NS = 2_000_000_000
+
+
+def results_cache_path(file_path: str):
+    """Path of the binary cache of a results CSV (a hidden .npz file next to it)."""
+    directory, name = os.path.split(file_path)
+    return os.path.join(directory, f".{name}.cache.npz")
+
+
+def scores_cache_path(cache_path: str):
+    """Path of the scores of a results cache (see results_cache_path), kept in a separate
+    .npy file so that they can be memory-mapped."""
+    return os.path.splitext(cache_path)[0] + ".scores.npy"
+
+
+def file_key(file_path: str):
+    """(size, modification time, inode) of a file."""
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+class ResultsTable:
+    """Parsed content of results.csv: question UIDs (columns), emails (rows) and raw scores.
+
+    Parsing is cached in a binary sidecar file (see results_cache_path) keyed by the size,
+    modification and change times, inode and hash of the CSV, so an unchanged file is loaded
+    without parsing. The hash is checked when the file was modified shortly before the cache
+    was written (see RACY_CACHE_NS).
+    Each row also has a hash of its scores, to find the rows that changed between two versions.
+
+    Cells that are not numbers (blank, missing at the end of a short row, text) are NaN in
+    scores and their text is kept in invalid_cells, indexed by (row, column): they are only an
+    error when they are read (see Results.fill_from_table).
+    """
+
+    def __init__(self, question_uids: list[str], emails: list[str], scores, row_hashes=None, invalid_cells=None):
+        self.question_uids = question_uids
+        self.emails = emails
+        self.scores = scores
+        self.invalid_cells = invalid_cells or {}
+        # Later rows override earlier ones for the same email
+        self.row_index = {email: row for row, email in enumerate(emails)}
+        # Hash of the bytes of each row of scores (so that NaN equals NaN) and of the text of
+        # its invalid cells
+        if row_hashes is None:
+            invalid_texts = collections.defaultdict(bytes)
+            for (row, column), text in sorted(self.invalid_cells.items()):
+                invalid_texts[row] += f"{column}:{text}\n".encode('utf-8')
+            row_hashes = np.frombuffer(b''.join(hashlib.blake2b(values.tobytes() + invalid_texts[row], digest_size=8).digest()
+                                                for row, values in enumerate(scores)), dtype=np.uint64)
+        self.row_hashes = row_hashes
+
+    def __repr__(self):
+        return f"ResultsTable(questions={len(self.question_uids)}, students={len(self.emails)})"
+
+    @classmethod
+    def parse(cls, text: str):
+        """Parse the text of a results CSV (part, title and header rows, then one row per student)."""
+        reader = csv.reader(io.StringIO(text, newline=''))
+
+        # Skip the first two rows (part and title rows) and use the third row as the header
+        first_rows = list(itertools.islice(reader, 3))
+        if len(first_rows) < 3:
+            raise ValueError('results file header is missing or too short')
+        question_uids = first_rows[2][1:]  # Exclude the 'email' column
+
+        emails = []
+        scores = array.array('d')
+        invalid_cells = {}
+        width = len(question_uids)
+        for row in reader:
+            if not row or not row[0]:
+                # Blank lines and rows without an email (e.g. ',,,' written by spreadsheet tools)
+                continue
+            cells = row[1:width + 1]
+            try:
+                if len(cells) != width:
+                    raise ValueError('short row')
+                values = list(map(float, cells))
+            except ValueError:
+                # Only an error if the cell is read (see Results.fill_from_table)
+                values = []
+                for column in range(width):
+                    try:
+                        values.append(float(cells[column]))
+                    except (IndexError, ValueError):
+                        values.append(math.nan)
+                        invalid_cells[len(emails), column] = cells[column] if column < len(cells) else ''
+            emails.append(row[0])
+            scores.extend(values)
+        scores = np.frombuffer(scores, dtype=np.float64).reshape(len(emails), width)
+        return cls(question_uids, emails, scores, invalid_cells=invalid_cells)
+
+    @classmethod
+    def from_csv(cls, file_path: str, use_cache: bool = True, mmap_mode: Optional[str] = None):
+        """Load results.csv, from its cache when the file did not change.
+
+        With a mmap_mode (see np.load), the scores are memory-mapped from the cache instead of
+        being held in memory.
+        """
+        cache_path = results_cache_path(file_path)
+        cached = cls.read_cache(cache_path, mmap_mode) if use_cache else None
+
+        stat = os.stat(file_path)
+        key = (stat.st_size, stat.st_mtime_ns, stat.st_ino, stat.st_ctime_ns)
+        if cached is not None and cached[0] == key and cached[3] - max(stat.st_mtime_ns, stat.st_ctime_ns) > RACY_CACHE_NS:
+            return cached[2]
+
+        with open(file_path, mode='rb') as csvfile:
+            data = csvfile.read()
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        if cached is not None and cached[1] == digest:
+            # Same content, only touched or copied: no need to parse it again
+            table = cached[2]
+        else:
+            table = cls.parse(data.decode('utf-8'))
+
+        # Do not record a key that may not match the content read (file written meanwhile)
+        stat = os.stat(file_path)
+        if use_cache and (stat.st_size, stat.st_mtime_ns, stat.st_ino, stat.st_ctime_ns) == key:
+            if table.write_cache(cache_path, key, digest) and mmap_mode is not None:
+                # Map the scores just written instead of keeping them in memory
+                cached = cls.read_cache(cache_path, mmap_mode)
+                if cached is not None:
+                    table = cached[2]
+        return table
+
+    @classmethod
+    def read_cache(cls, cache_path: str, mmap_mode: Optional[str] = None):
+        """(size, mtime, inode and ctime, hash, table, time written) stored in the cache file,
+        None if it is missing or unreadable. The scores are loaded with mmap_mode (see np.load)."""
+        scores_path = scores_cache_path(cache_path)
+        try:
+            with np.load(cache_path, allow_pickle=False) as cache:
+                key = tuple(int(value) for value in cache['key'])
+                digest = str(cache['digest'])
+                written_ns = int(cache['written_ns'])
+                scores_key = tuple(int(value) for value in cache['scores_key'])
+                question_uids = cache['question_uids'].tolist()
+                emails = cache['emails'].tolist()
+                row_hashes = cache['row_hashes']
+                invalid_cells = {(int(row), int(column)): str(text) for row, column, text
+                                 in zip(cache['invalid_rows'], cache['invalid_columns'], cache['invalid_texts'])}
+            # The scores file must be the one written with this cache file
+            if file_key(scores_path) != scores_key:
+                return None
+            scores = np.load(scores_path, mmap_mode=mmap_mode, allow_pickle=False)
+            if file_key(scores_path) != scores_key or scores.shape != (len(emails), len(question_uids)):
+                return None
+        except (OSError, ValueError, KeyError):
+            return None
+        return key, digest, cls(question_uids, emails, scores, row_hashes, invalid_cells), written_ns
+
+    def write_cache(self, cache_path: str, key, digest: str):
+        """Store the table and the key of its CSV in cache_path, the scores in a separate file
+        (see scores_cache_path). Best effort: returns False if they could not be written."""
+        scores_path = scores_cache_path(cache_path)
+        try:
+            with atomic_write(scores_path, 'wb') as scores_file:
+                np.save(scores_file, self.scores)
+            with atomic_write(cache_path, 'wb') as cache_file:
+                # Empty lists are stored as str arrays, not float arrays
+                np.savez(cache_file, key=np.array(key, dtype=np.int64), digest=np.array(digest), written_ns=np.array(time.time_ns()),
+                         scores_key=np.array(file_key(scores_path), dtype=np.int64),
+                         question_uids=np.array(self.question_uids, dtype=str),
+                         emails=np.array(self.emails, dtype=str), row_hashes=self.row_hashes,
+                         invalid_rows=np.array([row for row, _ in self.invalid_cells], dtype=np.int64),
+                         invalid_columns=np.array([column for _, column in self.invalid_cells], dtype=np.int64),
+                         invalid_texts=np.array(list(self.invalid_cells.values()), dtype=str))
+        except OSError:
+            return False
+        return True
+
+    def diff(self, previous):
+        """Changes since previous (with the same columns): (emails, question UIDs).
+
+        The emails are the students whose row hash differs, added or removed. The question
+        UIDs are the columns whose scores changed in these rows (all of them if students were
+        added or removed, since every question then has other scores).
+        """
+        common = [email for email in self.row_index if email in previous.row_index]
+        rows = np.array([self.row_index[email] for email in common], dtype=np.intp)
+        previous_rows = np.array([previous.row_index[email] for email in common], dtype=np.intp)
+        changed = self.row_hashes[rows] != previous.row_hashes[previous_rows]
+        emails = [email for email, row_changed in zip(common, changed.tolist()) if row_changed]
+        rows, previous_rows = rows[changed], previous_rows[changed]
+        # Compare the bits so that NaN equals NaN
+        columns = np.any(self.scores[rows].view(np.int64) != previous.scores[previous_rows].view(np.int64), axis=0)
+
+        added_or_removed = self.row_index.keys() ^ previous.row_index.keys()
+        if added_or_removed:
+            columns[:] = True
+        return emails + list(added_or_removed), [uid for uid, changed in zip(self.question_uids, columns.tolist()) if changed]
+
+
 class Results:
-    def __init__(self, class_: Class, evaluation: Evaluation, settings: GlobalSettings = GlobalSettings.default):
+    def __init__(self, class_: Class, evaluation: Evaluation, settings: GlobalSettings = GlobalSettings.default, matrix_path: Optional[str] = None):
         self.settings = settings
         self.class_ = class_
         self.evaluation = evaluation
 
         # Determine active questions by excluding dropped ones (dropped_questions are 1-based indices)
-        active_indices = [i for i in range(len(evaluation.questions)) if (i + 1) not in getattr(self.settings, 'dropped_questions', [])]
-        active_uids = [evaluation.get_question_uid(i) for i in active_indices]
+        self.dropped_questions = set(getattr(self.settings, 'dropped_questions', []))
+        self.active_indices = evaluation.active_question_indices(self.dropped_questions)
+        self.active_uids = [evaluation.question_uids[i] for i in self.active_indices]
+
+        # Row and column index maps: one row per student email, one column per active question
+        self.emails = list(class_.email_index)
+        self.row_index = {email: row for row, email in enumerate(self.emails)}
+        self.col_index = {uid: col for col, uid in enumerate(self.active_uids)}
+
+        # Points and coefficients of the active questions, aligned with the matrix columns
+        self.points = evaluation.points[self.active_indices]
+        self.coefficients = evaluation.coefficients[self.active_indices]
+
+        # Parts with active questions (in order of appearance among the active questions), and a
+        # (questions x parts) matrix with a 1 for the part of each active question: multiplying
+        # a row of question values by it sums them per part, for every part at once
+        active_part_ids = evaluation.part_ids[self.active_indices]
+        present_part_ids = np.array(list(dict.fromkeys(active_part_ids.tolist())), dtype=np.intp)
+        self.parts = [evaluation.parts[p] for p in present_part_ids.tolist()]
+        self.part_matrix = (active_part_ids[:, np.newaxis] == present_part_ids[np.newaxis, :]).astype(np.float64)
+        # Part (index in self.parts) of each active question
+        part_index = {part_id: p for p, part_id in enumerate(present_part_ids.tolist())}
+        self.part_ids = np.array([part_index[part_id] for part_id in active_part_ids.tolist()], dtype=np.intp)
+
+        # Raw points per student (rows) and active question (columns), in memory or
+        # memory-mapped from the .npy file matrix_path
+        self.matrix_path = matrix_path
+        shape = (len(self.emails), len(self.active_uids))
+        if matrix_path is None:
+            self.matrix = np.zeros(shape, dtype=np.float64)
+        else:
+            # Created under a temporary name: other processes may still map the previous file
+            temp_path = matrix_path + '.tmp.npy'
+            self.matrix = np.lib.format.open_memmap(temp_path, mode='w+', dtype=np.float64, shape=shape)
+            os.replace(temp_path, matrix_path)
 
-        # Initialize scores only for active question UIDs
-        self.scores = {student.email: {uid: 0.0 for uid in active_uids} for student in class_.students}
+        # Derived data (grades, statistics) computed on first use, see cached()
+        self.cache = {}
+        self.cache_settings = None
 
         # Apply 'given' questions: give full points to every student for those question numbers
+        self.apply_given_questions()
+
+    def apply_given_questions(self, rows=None):
+        """Give full points for the 'given' questions to the students in rows (all by default)."""
+        self.write_given_scores(rows)
+        self.invalidate_cache()
+
+    def write_given_scores(self, rows=None):
+        """Write full points for the 'given' questions in the matrix rows (all by default)."""
+        rows = slice(None) if rows is None else rows
         for qnum in getattr(self.settings, 'given_questions', []):
             idx = qnum - 1
-            if 0 <= idx < len(evaluation.questions):
-                uid = evaluation.get_question_uid(idx)
+            if 0 <= idx < len(self.evaluation.questions):
+                uid = self.evaluation.get_question_uid(idx)
                 # Only set if uid is active (i.e., not dropped)
-                if uid in next(iter(self.scores.values()), {}):
-                    full_score = evaluation.questions[idx].points
-                    for student_email in self.scores:
-                        self.scores[student_email][uid] = full_score
+                if uid in self.col_index:
+                    self.matrix[rows, self.col_index[uid]] = self.evaluation.questions[idx].points
+
+    def __getstate__(self):
+        # A memory-mapped matrix is sent to worker processes as its path, not its content.
+        # The sorted columns only serve incremental updates, in this process
+        state = self.__dict__.copy()
+        if self.matrix_path is not None:
+            state['matrix'] = None
+        state['cache'] = {key: value for key, value in self.cache.items() if key != 'sorted_columns'}
+        return state
+
+    def without_matrix(self):
+        """A copy of these results without the score matrix, to send the plots to worker
+        processes: only the methods that read precomputed data (see precompute) can be used."""
+        results = Results.__new__(Results)
+        results.__dict__.update(self.__getstate__())
+        results.matrix = None
+        results.matrix_path = None
+        # The plots read the part statistics from the summary
+        results.cache = {key: value for key, value in results.cache.items() if key != 'part_scores'}
+        return results
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.matrix_path is not None:
+            self.matrix = np.load(self.matrix_path, mmap_mode='r')
+
+    def column_blocks(self):
+        """Slices of matrix columns covering the whole matrix, of at most STATISTICS_BLOCK values
+        (but at least one column)."""
+        width = max(1, STATISTICS_BLOCK // max(1, self.matrix.shape[0]))
+        return [slice(start, start + width) for start in range(0, self.matrix.shape[1], width)]
+
+    def invalidate_cache(self):
+        """Drop all derived data. Must be called after writing to self.matrix directly."""
+        self.cache = {}
+
+    def cached(self, key, compute):
+        """Return the cached value for key, computing it on first use.
+
+        The cache is also dropped when the grading settings (bonus or added points) change.
+        """
+        settings = (self.settings.bonus_points, self.settings.added_points)
+        if settings != self.cache_settings:
+            self.cache = {}
+            self.cache_settings = settings
+        if key not in self.cache:
+            value = compute()
+            if isinstance(value, np.ndarray):
+                # Cached arrays are shared between callers
+                value.setflags(write=False)
+            self.cache[key] = value
+        return self.cache[key]
+
+    @property
+    def scores(self):
+        """Dict-of-dicts view of the score matrix, keyed by email then question UID."""
+        return {email: dict(zip(self.col_index, self.matrix[row].tolist())) for email, row in self.row_index.items()}
+
+    def weighted_scores(self, rows=None):
+        """Score matrix rows (all by default) with each column multiplied by its question coefficient."""
+        return (self.matrix if rows is None else self.matrix[rows]) * self.coefficients
 
     # Helper methods to get active questions
     def active_question_indices(self):
-        return [i for i in range(len(self.evaluation.questions)) if (i + 1) not in getattr(self.settings, 'dropped_questions', [])]
+        return self.active_indices
 
     def active_question_uids(self):
-        return [self.evaluation.get_question_uid(i) for i in self.active_question_indices()]
+        return self.active_uids
 
     def get_question_by_index(self, i: int):
         return self.evaluation.questions[i]
 
     def get_score(self, student_email: str, question_number: int):
-        if student_email in self.scores and 0 <= question_number < len(self.evaluation.questions):
+        if student_email in self.row_index and 0 <= question_number < len(self.evaluation.questions):
             question_uid = self.evaluation.get_question_uid(question_number)
-            if question_uid in self.scores[student_email]:
-                return self.scores[student_email][question_uid]
+            if question_uid in self.col_index:
+                return float(self.matrix[self.row_index[student_email], self.col_index[question_uid]])
             else:
                 # Dropped question: behave as if it doesn't exist
                 raise ValueError("Question has been dropped or does not exist for this results object")
@@ -266,135 +870,275 @@ class Results:
             raise ValueError("Invalid student email or question number")
 
     def set_score(self, student_email: str, question_uid: str, score: float):
-        if student_email in self.scores and question_uid in self.scores[student_email]:
-            self.scores[student_email][question_uid] = score
+        if student_email in self.row_index and question_uid in self.col_index:
+            rows = [self.row_index[student_email]]
+            previous = self.matrix[rows]
+            self.matrix[rows[0], self.col_index[question_uid]] = score
+            self.rows_changed(rows, previous)
         else:
             raise ValueError(
-                f"Invalid student email or question UID: {student_email}, {question_uid}\nAvailable question UIDs are: {list(self.scores[student_email].keys())}")
+                f"Invalid student email or question UID: {student_email}, {question_uid}\nAvailable question UIDs are: {list(self.col_index)}")
 
     def calculate_student_score(self, student_email: str, clamp: bool = True):
-        if student_email in self.scores:
-            total = 0.0
-            max_score = 0.0
-            # Use only active questions for calculation
-            for i in self.active_question_indices():
-                question = self.evaluation.questions[i]
-                question_uid = self.evaluation.get_question_uid(i)
-                # score stored is raw points
-                score = self.scores[student_email].get(question_uid, 0.0)
-                total += score * question.coefficient
-                max_score += question.points * question.coefficient
-            total += self.settings.added_points
-            grade = round_up((total / (max_score - self.settings.bonus_points)) * 5 + 1, 1) if max_score > 0 else 0.0
-            if clamp:
-                grade = min(grade, 6.0)
-            return grade
+        if student_email in self.row_index:
+            # Use only active questions (the matrix columns) for calculation
+            return float(self.grades_from_matrix(clamp, [self.row_index[student_email]])[0])
         else:
             raise ValueError("Invalid student email")
 
+    def compute_all_grades(self, clamp: bool = True):
+        """Grades of every student (one per matrix row), same rules as calculate_student_score."""
+        return self.cached(('grades', clamp), lambda: self.grades_from_matrix(clamp))
+
+    def weighted_totals(self, values):
+        """Coefficient-weighted sum of each row of values (rows of the matrix, or points)."""
+        return weighted_group_sums(values, self.coefficients, np.zeros(len(self.coefficients), dtype=np.intp), 1)[:, 0]
+
+    def grades_from_matrix(self, clamp: bool = True, rows=None):
+        """Grades of the students in the matrix rows (all by default)."""
+        totals = self.weighted_totals(self.matrix if rows is None else self.matrix[rows]) + self.settings.added_points
+        max_score = float(self.weighted_totals(self.points[np.newaxis])[0])
+        if max_score > 0:
+            grades = round_up_array((totals / (max_score - self.settings.bonus_points)) * 5 + 1, 1)
+        else:
+            grades = np.zeros(len(totals))
+        if clamp:
+            grades = np.minimum(grades, 6.0)
+        return grades
+
+    def part_scores(self):
+        """Coefficient-weighted score of every student (rows) in every part (columns)."""
+        return self.cached('part_scores', lambda: weighted_group_sums(self.matrix, self.coefficients, self.part_ids, len(self.parts)))
+
+    def summary(self):
+        """Statistics (rows, see STATISTICS) of every column of the results, in one table per group:
+
+        - 'questions': raw points of each active question,
+        - 'weighted_questions': coefficient-weighted points of each active question,
+        - 'parts': weighted score of each part,
+        - 'grades': the (clamped) grades, as a single column.
+
+        Every plot and the stats CSV read their statistics from here. The tables have no
+        columns when there are no students.
+        """
+        def compute():
+            students, questions = self.matrix.shape
+            if students == 0:
+                return {group: np.zeros((len(STATISTICS), 0)) for group in ('questions', 'weighted_questions', 'parts', 'grades')}
+
+            if self.matrix_path is None:
+                # Read from the sorted columns, which are kept up to date as rows change
+                summary = {group: columns.statistics() for group, columns in self.sorted_columns().items()}
+                for table in summary.values():
+                    table.setflags(write=False)
+                return summary
+
+            # Memory-mapped matrix: no sorted copy of it, statistics of one block of question
+            # columns at a time (raw, then weighted), each column sorted once
+            raw_tables, weighted_tables = [], []
+            for block in self.column_blocks():
+                rows = np.ascontiguousarray(self.matrix[:, block].T)
+                raw_tables.append(row_statistics(rows))
+                rows *= self.coefficients[block, np.newaxis]
+                weighted_tables.append(row_statistics(rows))
+                del rows
+            other_table = row_statistics(np.concatenate([self.part_scores().T, self.compute_all_grades()[np.newaxis]]))
+            summary = {
+                'questions': np.concatenate(raw_tables, axis=1) if raw_tables else np.zeros((len(STATISTICS), 0)),
+                'weighted_questions': np.concatenate(weighted_tables, axis=1) if weighted_tables else np.zeros((len(STATISTICS), 0)),
+                'parts': other_table[:, :-1],
+                'grades': other_table[:, -1:]
+            }
+            for table in summary.values():
+                # Shared between callers, like the other cached arrays
+                table.setflags(write=False)
+            return summary
+        return self.cached('summary', compute)
+
+    def group_values(self):
+        """Values of each group of summary columns (see summary), one row per student."""
+        return {
+            'questions': self.matrix,
+            'weighted_questions': self.weighted_scores(),
+            'parts': self.part_scores(),
+            'grades': self.compute_all_grades()[:, np.newaxis]
+        }
+
+    def sorted_columns(self):
+        """SortedColumns of each group of summary columns, see rows_changed."""
+        return self.cached('sorted_columns', lambda: {group: SortedColumns(values) for group, values in self.group_values().items()})
+
+    def rows_changed(self, rows, previous):
+        """Update the derived data after the matrix rows changed (previous: their former values).
+
+        When the statistics were already computed, the grades and part scores of these rows
+        are recomputed in place and the sorted columns updated cell by cell, instead of
+        recomputing everything for every student. Only the means of the changed columns are
+        summed again over all students (see SortedColumns.update).
+        """
+        settings = (self.settings.bonus_points, self.settings.added_points)
+        if 'sorted_columns' not in self.cache or settings != self.cache_settings:
+            self.invalidate_cache()
+            return
+        rows = np.asarray(rows, dtype=np.intp)
+        changed = (self.matrix[rows] != previous).any(axis=1)
+        rows, previous = rows[changed], previous[changed]
+        if len(rows) == 0:
+            return
+
+        previous_values = {
+            'questions': previous,
+            'weighted_questions': previous * self.coefficients,
+            'parts': self.part_scores()[rows],
+            'grades': self.compute_all_grades()[rows, np.newaxis]
+        }
+        # Keep only what is updated below; the rest is recomputed when needed
+        cache = {key: value for key, value in self.cache.items() if key in ('sorted_columns', 'part_scores', ('grades', True), ('grades', False))}
+        for clamp in (True, False):
+            if ('grades', clamp) in cache:
+                write_rows(cache['grades', clamp], rows, self.grades_from_matrix(clamp, rows))
+        part_scores = cache['part_scores']
+        write_rows(part_scores, rows, weighted_group_sums(self.matrix[rows], self.coefficients, self.part_ids, len(self.parts)))
+        self.cache = cache
+
+        column_values = {
+            'questions': lambda j: self.matrix[:, j],
+            'weighted_questions': lambda j: self.matrix[:, j] * self.coefficients[j],
+            'parts': lambda j: part_scores[:, j],
+            'grades': lambda j: cache['grades', True]
+        }
+        current_values = {
+            'questions': self.matrix[rows],
+            'weighted_questions': self.weighted_scores(rows),
+            'parts': part_scores[rows],
+            'grades': cache['grades', True][rows, np.newaxis]
+        }
+        for group, columns in cache['sorted_columns'].items():
+            columns.update(previous_values[group], current_values[group], column_values[group])
+
+    def question_statistics(self):
+        """Min, Q1, median, Q3, max and mean of the weighted scores of each active question."""
+        return tuple(self.summary()['weighted_questions'])
+
+    def part_statistics(self):
+        """Min, Q1, median, Q3, max and mean of the weighted scores of each part."""
+        return tuple(self.summary()['parts'])
+
+    def grade_statistics(self):
+        """Min, Q1, median, Q3, max and mean of the (clamped) grades, zeros if there are no students."""
+        grades = self.summary()['grades']
+        return tuple(grades[:, 0].tolist()) if grades.shape[1] else (0.0,) * len(STATISTICS)
+
+    def precompute(self):
+        """Fill the cache with everything the plots and the stats CSV use, so that copies of
+        this object sent to worker processes do not recompute it."""
+        self.compute_all_grades()
+        self.compute_all_grades(clamp=False)
+        self.summary()
+        self.get_count_below_4()
+
+    def question_averages(self):
+        """Average raw points of each active question (zeros if there are no students)."""
+        questions = self.summary()['questions']
+        return questions[STATISTICS.index('mean')] if questions.shape[1] else np.zeros(len(self.active_uids))
+
+    def question_medians(self):
+        """Median raw points of each active question (zeros if there are no students)."""
+        questions = self.summary()['questions']
+        return questions[STATISTICS.index('median')] if questions.shape[1] else np.zeros(len(self.active_uids))
+
     def __repr__(self):
         return f"Results(class_={self.class_.name}, evaluation={self.evaluation.name}, scores={self.scores})"
 
-    def write_results_to_csv(self, file_path: str):
-        with open(file_path, mode='w', newline='', encoding='utf-8') as csvfile:
-            # Use only active question uids
-            active_indices = self.active_question_indices()
-            fieldnames = ['email'] + [self.evaluation.get_question_uid(i) for i in active_indices]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-            # Write the part numbers as the first row
-            part_row = {'email': 'Part'}
-            part_row.update({self.evaluation.get_question_uid(i): self.evaluation.questions[i].part for i in active_indices})
-            writer.writerow(part_row)
+    def write_header_rows(self, writer, extra_columns=(), header: bool = True):
+        """Write the part and title rows, then the header row unless header is False."""
+        active_questions = [self.evaluation.questions[i] for i in self.active_indices]
+        writer.writerow(['Part'] + [question.part for question in active_questions] + [''] * len(extra_columns))
+        writer.writerow(['Title'] + [question.title for question in active_questions] + [''] * len(extra_columns))
+        if header:
+            writer.writerow(['email'] + self.active_uids + list(extra_columns))
 
-            # Write the question titles as the second row
-            title_row = {'email': 'Title'}
-            title_row.update({self.evaluation.get_question_uid(i): self.evaluation.questions[i].title for i in active_indices})
-            writer.writerow(title_row)
+    def write_results_to_csv(self, file_path: str):
+        with atomic_write(file_path, newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            self.write_header_rows(writer)
 
-            # Write the scores for each student
-            writer.writeheader()
-            for student_email, scores in self.scores.items():
-                row = {'email': student_email}
-                row.update({self.evaluation.get_question_uid(i): scores.get(self.evaluation.get_question_uid(i), 0.0) for i in active_indices})
-                writer.writerow(row)
+            # Write the scores for each student, a whole matrix row at a time
+            writer.writerows([student_email] + scores.tolist() for student_email, scores in zip(self.emails, self.matrix))
 
     def write_results_with_stats(self, file_path: str):
-        with open(file_path, mode='w', newline='', encoding='utf-8') as csvfile:
-            active_indices = self.active_question_indices()
-            fieldnames = ['email'] + [self.evaluation.get_question_uid(i) for i in active_indices] + ['Total Grade']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        with atomic_write(file_path, newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            # The stats CSV has no header row
+            self.write_header_rows(writer, ['Total Grade'], header=False)
 
-            # Write the part numbers as the first row
-            part_row = {'email': 'Part'}
-            part_row.update({self.evaluation.get_question_uid(i): self.evaluation.questions[i].part for i in active_indices})
-            writer.writerow(part_row)
-
-            # Write the question titles as the second row
-            title_row = {'email': 'Title'}
-            title_row.update({self.evaluation.get_question_uid(i): self.evaluation.questions[i].title for i in active_indices})
-            writer.writerow(title_row)
-
-            # Write the scores for each student
-            for student_email, scores in self.scores.items():
-                row = {'email': student_email}
-                row.update({self.evaluation.get_question_uid(i): scores.get(self.evaluation.get_question_uid(i), 0.0) for i in active_indices})
-                row['Total Grade'] = self.calculate_student_score(student_email, clamp=False)
-                writer.writerow(row)
-
-            # Calculate and write the average for each question
-            average_row = {'email': 'Average'}
-            for i in active_indices:
-                question_uid = self.evaluation.get_question_uid(i)
-                question_scores = [self.scores[student_email].get(question_uid, 0.0) for student_email in self.scores]
-                average_row[question_uid] = f"{np.mean(question_scores):.2f}" if question_scores else "0.00"
-            average_row['Total Grade'] = f"{self.get_total_average():.2f}"
-            writer.writerow(average_row)
-
-            # Calculate and write the median for each question
-            median_row = {'email': 'Median'}
-            for i in active_indices:
-                question_uid = self.evaluation.get_question_uid(i)
-                question_scores = [self.scores[student_email].get(question_uid, 0.0) for student_email in self.scores]
-                median_row[question_uid] = f"{np.median(question_scores):.2f}" if question_scores else "0.00"
-            median_row['Total Grade'] = f"{self.get_total_median():.2f}"
-            writer.writerow(median_row)
+            # Write the scores and the total grade of each student
+            grades = self.compute_all_grades(clamp=False).tolist()
+            writer.writerows([student_email] + scores.tolist() + [grade] for student_email, scores, grade in zip(self.emails, self.matrix, grades))
+
+            # Write the average and the median of each question (computed once for all columns)
+            writer.writerow(['Average'] + [f"{average:.2f}" for average in self.question_averages().tolist()] + [f"{self.get_total_average():.2f}"])
+            writer.writerow(['Median'] + [f"{median:.2f}" for median in self.question_medians().tolist()] + [f"{self.get_total_median():.2f}"])
 
     @classmethod
     def read_results_from_csv(cls, file_path: str, class_: Class, evaluation: Evaluation, settings: GlobalSettings = GlobalSettings.default):
         # Initialize results with settings so dropped/given are taken into account
         results = cls(class_, evaluation, settings)
-        with open(file_path, mode='r', newline='', encoding='utf-8') as csvfile:
-            reader = csv.reader(csvfile)
-
-            # Skip the first two rows (part and title rows)
-            next(reader)
-            next(reader)
-
-            # Use the third row as the header
-            headers = next(reader)
-            question_uids = headers[1:]  # Exclude the 'email' column
-
-            for row in reader:
-                student_email = row[0]
-                for i, question_uid in enumerate(question_uids):
-                    # Only set scores for active questions (others are treated as dropped)
-                    if student_email in results.scores and question_uid in results.scores[student_email]:
-                        score = float(row[i + 1])
-                        results.set_score(student_email, question_uid, score)
-
-        # After reading, ensure that 'given' questions are set to full points for everyone
-        for qnum in getattr(results.settings, 'given_questions', []):
-            idx = qnum - 1
-            if 0 <= idx < len(evaluation.questions):
-                uid = evaluation.get_question_uid(idx)
-                if uid in next(iter(results.scores.values()), {}):
-                    full_score = evaluation.questions[idx].points
-                    for student_email in results.scores:
-                        results.scores[student_email][uid] = full_score
-
+        results.fill_from_table(ResultsTable.from_csv(file_path))
         return results
 
+    def fill_from_table(self, table: ResultsTable, emails=None):
+        """Set scores from a parsed results.csv.
+
+        Only the students in emails are updated (all of them by default). Students without a
+        row get 0 everywhere, and 'given' questions are reapplied to the updated students.
+        When only some students are updated, returns the changed cells as (email, question UID,
+        old score, new score) tuples and updates the derived data incrementally (see rows_changed).
+        """
+        # Only read columns of active questions (others are treated as dropped)
+        csv_columns = [i for i, uid in enumerate(table.question_uids) if uid in self.col_index]
+        matrix_columns = [self.col_index[table.question_uids[i]] for i in csv_columns]
+
+        student_rows = []
+        filled_rows = []
+        table_rows = []
+        for email in (self.emails if emails is None else emails):
+            student_row = self.row_index.get(email)
+            if student_row is None:
+                continue
+            student_rows.append(student_row)
+            if email in table.row_index:
+                filled_rows.append(student_row)
+                table_rows.append(table.row_index[email])
+
+        # Cells that are not numbers are an error only where they are read
+        if table.invalid_cells:
+            read_rows = set(table_rows)
+            read_columns = set(csv_columns)
+            for (row, column), text in table.invalid_cells.items():
+                if row in read_rows and column in read_columns:
+                    raise ValueError(f"invalid score {text!r} of {table.emails[row]} for {table.question_uids[column]}")
+        # Former values of the updated rows (a full fill recomputes everything)
+        previous = None if emails is None else self.matrix[student_rows]
+        self.matrix[student_rows] = 0.0
+        # A block of rows at a time: the matrix and the table scores may be memory-mapped
+        for start in range(0, len(filled_rows), ROW_BLOCK):
+            block = slice(start, start + ROW_BLOCK)
+            self.matrix[np.ix_(filled_rows[block], matrix_columns)] = table.scores[np.ix_(table_rows[block], csv_columns)]
+
+        # After reading, ensure that 'given' questions are set to full points
+        if emails is None:
+            self.apply_given_questions()
+            return []
+        self.write_given_scores(student_rows)
+
+        # Changed cells, as (email, question UID, old score, new score)
+        current = self.matrix[student_rows]
+        changes = [(self.emails[student_rows[r]], self.active_uids[c], float(previous[r, c]), float(current[r, c]))
+                   for r, c in zip(*np.nonzero(previous != current))]
+        self.rows_changed(student_rows, previous)
+        return changes
+
     def plot_style(self, ax):
         ax.spines['top'].set_visible(False)
         ax.spines['right'].set_visible(False)
@@ -406,8 +1150,7 @@ class Results:
         ax.tick_params(axis='y', colors=SECONDARY_COLOR)
 
     def plot_grades_histogram(self, ax, bin_width: float = 0.5):
-        grades = [self.calculate_student_score(
-            student.email) for student in self.class_.students]
+        grades = self.compute_all_grades()
         bins = [i * bin_width for i in range(int(6 / bin_width) + 1)]
 
         self.plot_style(ax)
@@ -421,127 +1164,84 @@ class Results:
         ax.grid(axis='y', linestyle='--', alpha=0.7)
 
     def plot_statistics(self, ax, labels, max_points, min_values, q1_values, median_values, q3_values, max_values, average_values):
-        # Plotting
-        x_positions = np.arange(len(labels))
+        from matplotlib.collections import LineCollection, PolyCollection
 
-        quartiles_handle = None
-        min_handle = None
-        max_handle = None
-        median_handle = None
-        max_points_handle = None
+        # Plotting
+        x_positions = np.arange(len(labels), dtype=np.float64)
+        # Only draw the labels that have statistics (none when there are no students)
+        count = min(len(labels), len(min_values))
+        max_points, min_values, q1_values, median_values, q3_values, max_values, average_values = (
+            np.asarray(values, dtype=np.float64)[:count] for values in (max_points, min_values, q1_values, median_values, q3_values, max_values, average_values))
+        box_positions = x_positions[:count]
 
         self.plot_style(ax)
 
-        for i, (min_val, q1, median, q3, max_val, max_point) in enumerate(zip(min_values, q1_values, median_values, q3_values, max_values, max_points)):
-            # Vertical dashed line from min to max
-            ax.plot([i, i], [min_val, max_val], color='gray',
-                    linestyle='--', linewidth=1, zorder=1)
-            # Line at min
-            min_handle, = ax.plot(
-                [i - 0.2, i + 0.2], [min_val, min_val], color=SECONDARY_COLOR, linewidth=1, zorder=3)
-            # Line at max
-            max_handle, = ax.plot(
-                [i - 0.2, i + 0.2], [max_val, max_val], color=SECONDARY_COLOR, linewidth=1, zorder=3)
-
-            # Box between Q1 and Q3
-            quartiles_handle, = ax.bar(
-                i, q3 - q1, bottom=q1, width=0.4, color=SEC_HIGHLIGHT_COLOR, zorder=2)
-            # Line at median
-            median_handle, = ax.plot(
-                [i - 0.2, i + 0.2], [median, median], color=HIGHLIGHT_COLOR, linewidth=2, zorder=3)
-
-            # Lightgray bar in the background for max obtainable points
-            max_points_handle, = ax.bar(
-                i, max_point, width=0.8, color=TERNARY_COLOR, alpha=0.5, zorder=0)
-
-            # Average values
-            average_handle = ax.bar(
-                i, average_values[i], width=0.8, color=HIGHLIGHT_COLOR, alpha=0.2, zorder=0)
+        def lines(half_width, y_start, y_end):
+            """One segment per label, from (x - half_width, y_start) to (x + half_width, y_end)."""
+            return np.stack([np.column_stack([box_positions - half_width, y_start]),
+                             np.column_stack([box_positions + half_width, y_end])], axis=1)
+
+        def bars(half_width, bottom, top):
+            """One rectangle per label, like ax.bar: the axes get no margin below the bottoms."""
+            left, right = box_positions - half_width, box_positions + half_width
+            bottom = np.broadcast_to(bottom, box_positions.shape)
+            rectangles = np.stack([np.column_stack([left, bottom]), np.column_stack([right, bottom]),
+                                   np.column_stack([right, top]), np.column_stack([left, top])], axis=1)
+            return rectangles, bottom.tolist()
+
+        # One collection per visual role rather than one artist per label and role, so that
+        # the rendering cost does not grow with the number of questions
+        # Vertical dashed line from min to max
+        ax.add_collection(LineCollection(lines(0, min_values, max_values), colors='gray',
+                                         linestyles='--', linewidths=1, zorder=1))
+        # Lines at min and max
+        ax.add_collection(LineCollection(np.concatenate([lines(0.2, min_values, min_values), lines(0.2, max_values, max_values)]),
+                                         colors=SECONDARY_COLOR, linewidths=1, capstyle='projecting', zorder=3))
+        # Line at median
+        ax.add_collection(LineCollection(lines(0.2, median_values, median_values),
+                                         colors=HIGHLIGHT_COLOR, linewidths=2, capstyle='projecting', zorder=3))
+
+        # Box between Q1 and Q3, lightgray bar in the background for max obtainable points,
+        # and average values
+        for (rectangles, bottoms), color, alpha, zorder in [(bars(0.2, q1_values, q3_values), SEC_HIGHLIGHT_COLOR, None, 2),
+                                                             (bars(0.4, 0.0, max_points), TERNARY_COLOR, 0.5, 0),
+                                                             (bars(0.4, 0.0, average_values), HIGHLIGHT_COLOR, 0.2, 0)]:
+            collection = PolyCollection(rectangles, facecolors=color, alpha=alpha, edgecolors='none', linewidths=0, zorder=zorder)
+            collection.sticky_edges.y.extend(bottoms)
+            ax.add_collection(collection)
+        ax.autoscale_view()
 
         ax.set_xticks(x_positions)
         ax.set_xticklabels(labels, rotation=45, ha='right')
         ax.set_ylabel('Scores')
         ax.grid(axis='y', linestyle='--', alpha=0.7)
-        # ax.legend([max_points_handle, max_handle, quartiles_handle, average_handle, median_handle, min_handle],
-        #   ['Max Points', 'Max', 'Q1-Q3 Range', 'Average', 'Median', 'Min'], loc='upper right')
 
     def plot_question_statistics(self, ax):
         # Calculate statistics per question
         question_titles = []
         # Use only active questions
-        active_indices = self.active_question_indices()
-        max_points = [self.evaluation.questions[i].points * self.evaluation.questions[i].coefficient for i in active_indices]
-        min_values = []
-        q1_values = []
-        median_values = []
-        average_values = []
-        q3_values = []
-        max_values = []
-
-        last_part = None
-        part_id = 0
+        active_indices = self.active_indices
+        max_points = self.points * self.coefficients
 
         for i in active_indices:
             question = self.evaluation.questions[i]
-            question_uid = self.evaluation.get_question_uid(i)
-            question_scores = [self.scores[student_email].get(question_uid, 0.0) * question.coefficient for student_email in self.scores]
-
             # Prefix the question number before the question title in plots
             question_titles.append(f"Q{i+1} - {question.part} : {question.title}")
 
-            if question_scores:
-                quartiles = np.percentile(question_scores, [0, 25, 50, 75, 100])
-                min_values.append(quartiles[0])
-                q1_values.append(quartiles[1])
-                median_values.append(quartiles[2])
-                q3_values.append(quartiles[3])
-                max_values.append(quartiles[4])
-                average_values.append(np.mean(question_scores))
+        min_values, q1_values, median_values, q3_values, max_values, average_values = self.question_statistics()
 
         self.plot_statistics(ax, question_titles, max_points, min_values,
                              q1_values, median_values, q3_values, max_values, average_values)
         ax.set_title('Statistics per Question')
 
     def plot_statistics_per_part(self, ax):
-        # Group questions by part
-        parts = {}
-        active_indices = self.active_question_indices()
-        for i in active_indices:
-            question = self.evaluation.questions[i]
-            question_uid = self.evaluation.get_question_uid(i)
-            if question.part not in parts:
-                parts[question.part] = []
-            parts[question.part].append((question, question_uid))
-
         # Calculate statistics per part
         part_titles = []
         max_points = []
-        max_values = []
-        q1_values = []
-        median_values = []
-        q3_values = []
-        min_values = []
-        average_values = []
-
-        for part, questions in parts.items():
-            part_scores = [0 for _ in range(len(self.scores))]
-            part_max_points = sum(
-                question.points * question.coefficient for question, _ in questions)
-
-            for question, question_uid in questions:
-                for i, student_email in enumerate(self.scores):
-                    part_scores[i] += self.scores[student_email].get(question_uid, 0.0) * question.coefficient
-
-            if part_scores:
-                quartiles = np.percentile(part_scores, [0, 25, 50, 75, 100])
-                part_titles.append(part)
-                max_points.append(part_max_points)
-                max_values.append(quartiles[4])
-                min_values.append(quartiles[0])
-                q1_values.append(quartiles[1])
-                median_values.append(quartiles[2])
-                q3_values.append(quartiles[3])
-                average_values.append(np.mean(part_scores))
+        if self.emails:
+            part_titles = self.parts
+            max_points = (self.points * self.coefficients) @ self.part_matrix
+        min_values, q1_values, median_values, q3_values, max_values, average_values = self.part_statistics()
 
         self.plot_statistics(ax, part_titles, max_points, min_values,
                              q1_values, median_values, q3_values, max_values, average_values)
@@ -565,55 +1265,27 @@ class Results:
         ax.grid(axis='y', linestyle='--', alpha=0.7)
 
     def plot_average_and_max_per_question(self, ax):
-        active_indices = self.active_question_indices()
-        question_uids = [self.evaluation.get_question_uid(i) for i in active_indices]
-        max_grades = [self.evaluation.questions[i].points for i in active_indices]
+        active_indices = self.active_indices
+        max_grades = self.points
 
         # Calculate average grades for each (active) question
-        average_grades = []
-        for i, uid in zip(active_indices, question_uids):
-            total_score = sum(self.scores[student_email].get(uid, 0.0) for student_email in self.scores)
-            average_grades.append(total_score / len(self.scores) if self.scores else 0)
+        average_grades = self.question_averages()
 
         # Labels include the question number before the title
         labels = [f"Q{i+1} {self.evaluation.questions[i].title}" for i in active_indices]
         self.plot_average_and_max(ax, labels, average_grades, max_grades)
 
     def plot_average_and_max_grades_per_part(self, ax):
-        # Group questions by part
-        parts = {}
-        active_indices = self.active_question_indices()
-        for i in active_indices:
-            question = self.evaluation.questions[i]
-            question_uid = self.evaluation.get_question_uid(i)
-            if question.part not in parts:
-                parts[question.part] = []
-            parts[question.part].append((question, question_uid))
-
-        # Calculate average and max grades per part
-        part_titles = list(parts.keys())
-        max_grades = []
-        average_grades = []
-
-        for part, questions in parts.items():
-            part_max_grade = sum(question.points for question, _ in questions)
-            part_total_score = 0.0
-            for question, question_uid in questions:
-                part_total_score += sum(self.scores[student_email].get(question_uid, 0.0)
-                                        for student_email in self.scores)
-            part_average_grade = part_total_score / \
-                len(self.scores) if self.scores else 0.0
-            max_grades.append(part_max_grade)
-            average_grades.append(part_average_grade)
-
-        self.plot_average_and_max(ax, part_titles, average_grades, max_grades)
+        # Calculate average and max grades per part (the average of a sum is the sum of the averages)
+        max_grades = self.points @ self.part_matrix
+        average_grades = self.question_averages() @ self.part_matrix
+
+        self.plot_average_and_max(ax, self.parts, average_grades, max_grades)
 
     def plot_global_statistics_h(self, ax, show_individual: bool = True):
         # Plot overall statistics in the 6th subplot
-        all_grades = [self.calculate_student_score(
-            student.email) for student in self.class_.students]
-        quartiles = np.percentile(all_grades, [0, 25, 50, 75, 100])
-        average_grade = np.mean(all_grades)
+        all_grades = self.compute_all_grades()
+        *quartiles, average_grade = self.grade_statistics()
 
         self.plot_style(ax)
 
@@ -647,8 +1319,6 @@ class Results:
 
         # Scatter plot of all grades
         if show_individual:
-            all_grades = [self.calculate_student_score(
-                student.email) for student in self.class_.students]
             np.random.seed(0)  # For reproducibility
             y_offsets_amp = 0.03
             y_offsets = np.random.uniform(-y_offsets_amp,
@@ -668,10 +1338,8 @@ class Results:
 
     def plot_global_statistics_v(self, ax, show_individual: bool = True):
         # Plot overall statistics vertically
-        all_grades = [self.calculate_student_score(
-            student.email) for student in self.class_.students]
-        quartiles = np.percentile(all_grades, [0, 25, 50, 75, 100])
-        average_grade = np.mean(all_grades)
+        all_grades = self.compute_all_grades()
+        *quartiles, average_grade = self.grade_statistics()
 
         self.plot_style(ax)
 
@@ -710,30 +1378,15 @@ class Results:
         if show_individual:
 
             # Scatter plot of all grades
-            all_grades = [self.calculate_student_score(
-                student.email) for student in self.class_.students]
             np.random.seed(0)  # For reproducibility
             x_offsets_amp = 0.03
             x_offsets = np.random.uniform(-x_offsets_amp,
                                           x_offsets_amp, len(all_grades))
             ax.scatter(x_offsets, all_grades, color=HIGHLIGHT_COLOR, zorder=6)
 
-            # Add student names to the right of the plot with lines connecting to points
-            offset = 1000
-            min_gap = 0.15
-            x_pos = 0.51
-            # Sort students by descending grade and align x_offsets accordingly
-            student_offsets = list(zip(self.class_.students, x_offsets))
-            sorted_student_offsets = sorted(
-                student_offsets, key=lambda pair: self.calculate_student_score(pair[0].email), reverse=True)
-
-            for i, (student, x_offset) in enumerate(sorted_student_offsets):
-                grade = self.calculate_student_score(student.email)
-                offset = min(offset - min_gap, grade)
-                ax.text(x_pos, offset, f"{grade} {student.first_name} {student.last_name}",
-                        fontsize=8, color=PRIMARY_COLOR, va='center')
-                ax.plot([x_offset, x_pos], [grade, offset], color="black",
-                        alpha=0.2, linestyle='-', linewidth=0.5, zorder=5)
+            # Large classes get their grades listed on separate pages instead (see plot_grade_list)
+            if len(self.class_.students) <= self.settings.max_labeled_students:
+                self.plot_student_labels(ax, x_offsets)
 
             # Adjust the grid to stop at around 1 on the right
             ax.set_xlim(left=-0.5, right=0.5)
@@ -745,6 +1398,47 @@ class Results:
                   ['Min to Max', 'Average', 'Median', 'Q1-Q3 Range'], loc='lower left')
         ax.grid(axis='y', linestyle='--', alpha=0.7, clip_on=False)
 
+    def sorted_student_grades(self, students):
+        """Order of students by descending grade, and their grades in that order."""
+        student_grades = self.compute_all_grades()[[self.row_index[student.email] for student in students]]
+        # Stable, so students with the same grade stay in roster order
+        order = np.argsort(-student_grades, kind='stable')
+        return order, student_grades[order]
+
+    def plot_student_labels(self, ax, x_offsets):
+        """Add student names to the right of the plot with lines connecting to their points
+        (at x_offsets, one per student)."""
+        from matplotlib.collections import LineCollection
+
+        min_gap = 0.15
+        x_pos = 0.51
+        # Sort students by descending grade and align x_offsets accordingly
+        students = self.class_.students[:len(x_offsets)]
+        order, grades = self.sorted_student_grades(students)
+        students = [students[i] for i in order]
+        x_offsets = np.asarray(x_offsets)[:len(students)][order]
+        count = len(students)
+
+        # Each label goes at its grade, or min_gap below the previous label if that is lower:
+        # offset[i] = min(offset[i - 1] - min_gap, grade[i]), computed as a running minimum
+        steps = np.arange(count) * min_gap
+        offsets = np.minimum(np.minimum.accumulate(grades + steps) - steps, 1000 - (steps + min_gap))
+
+        for student, grade, offset in zip(students, grades.tolist(), offsets.tolist()):
+            ax.text(x_pos, offset, f"{grade} {student.first_name} {student.last_name}",
+                    fontsize=8, color=PRIMARY_COLOR, va='center')
+        segments = np.stack([np.column_stack([x_offsets, grades]), np.column_stack([np.full(count, x_pos), offsets])], axis=1)
+        ax.add_collection(LineCollection(segments, colors="black", alpha=0.2, linestyles='-', linewidths=0.5, capstyle='projecting', zorder=5))
+        ax.autoscale_view()
+
+    def plot_grade_list(self, fig, students, grades, columns: int = GRADE_LIST_COLUMNS, rows: int = GRADE_LIST_ROWS):
+        """Write the students and grades (at most columns * rows) on fig, in columns."""
+        for column in range(columns):
+            lines = [f"{grade} {student.first_name} {student.last_name}"
+                     for student, grade in zip(students[column * rows:(column + 1) * rows], grades[column * rows:(column + 1) * rows])]
+            # One text per column rather than per student
+            fig.text(0.05 + column * 0.9 / columns, 0.92, "\n".join(lines), fontsize=8, color=PRIMARY_COLOR, va='top', linespacing=1.3)
+
     def plot_global_statistics_split(self, ax):
         ax.axis('off')  # Turn off the axis
 
@@ -759,31 +1453,19 @@ class Results:
         right_ax.axis('off')  # Turn off the right subplot for now
 
     def get_total_average(self):
-        all_grades = [self.calculate_student_score(
-            student.email) for student in self.class_.students]
-        return np.average(all_grades) if all_grades else 0.0
+        return self.grade_statistics()[5]
 
     def get_total_max(self):
-        all_grades = [self.calculate_student_score(
-            student.email) for student in self.class_.students]
-        return max(all_grades) if all_grades else 0.0
+        return self.grade_statistics()[4]
 
     def get_total_min(self):
-        all_grades = [self.calculate_student_score(
-            student.email) for student in self.class_.students]
-        return min(all_grades) if all_grades else 0.0
+        return self.grade_statistics()[0]
 
     def get_total_median(self):
-        all_grades = [self.calculate_student_score(
-            student.email) for student in self.class_.students]
-        return np.median(all_grades) if all_grades else 0.0
+        return self.grade_statistics()[2]
 
     def get_count_below_4(self):
-        count = 0
-        for student_email in self.scores:
-            if self.calculate_student_score(student_email) < 4:
-                count += 1
-        return count
+        return self.cached('count_below_4', lambda: int(np.count_nonzero(self.compute_all_grades() < 4)))
 
     def get_percent_below_4(self):
         count = self.get_count_below_4()
@@ -801,6 +1483,7 @@ class Results:
                 va='center', fontsize=14, color=PRIMARY_COLOR, linespacing=1.5)
 
     def plot_all_statistics(self, file_path: str, show_individual: bool = True):
+        plt = import_pyplot()
         fig = plt.figure(figsize=(18, 12))
         gs = fig.add_gridspec(3, 3, height_ratios=[
                               4, 3, 1], width_ratios=[1, 1, 0.4])
@@ -826,353 +1509,1040 @@ class Results:
         self.write_global_values(ax5, show_individual)
 
         plt.tight_layout()
-        plt.savefig(file_path)
-        plt.close(fig)
+        file_format = os.path.splitext(file_path)[1][1:] or None
+        if not show_individual or len(self.class_.students) <= self.settings.max_labeled_students or file_format != 'pdf':
+            with atomic_write(file_path, 'wb') as f:
+                plt.savefig(f, format=file_format)
+            plt.close(fig)
+            return
+
+        # Too many students to label them in the plot: list them on the next pages
+        from matplotlib.backends.backend_pdf import PdfPages
+        order, grades = self.sorted_student_grades(self.class_.students)
+        students = [self.class_.students[i] for i in order]
+        grades = grades.tolist()
+        per_page = GRADE_LIST_COLUMNS * GRADE_LIST_ROWS
+        with atomic_write(file_path, 'wb') as f, PdfPages(f) as pdf:
+            pdf.savefig(fig)
+            plt.close(fig)
+            for start in range(0, len(students), per_page):
+                page = plt.figure(figsize=(18, 12))
+                page.suptitle(f"Grades ({start + 1}-{min(start + per_page, len(students))} of {len(students)})", color=PRIMARY_COLOR)
+                self.plot_grade_list(page, students[start:start + per_page], grades[start:start + per_page])
+                pdf.savefig(page)
+                plt.close(page)
+
+
+def parse_score(raw: str):
+    """Parse a score cell of an online export. Empty cells count as 0, and cells with extra
+    characters (like % or quotes) are parsed from their digits, '.' and '-' only."""
+    raw = (raw or '').strip()
+    if raw == '':
+        return 0.0
+    try:
+        return float(raw)
+    except ValueError:
+        cleaned = ''.join(ch for ch in raw if (ch.isdigit() or ch in '.-'))
+        return float(cleaned) if cleaned != '' else 0.0
 
 
-def import_online_csv_to_results(online_csv_path: str, results_file: str, roster_file: str, questions_file: str, class_: Class, evaluation: Evaluation, settings: GlobalSettings = GlobalSettings.default):
-    """Import an online grading-export CSV and populate results.csv accordingly.
+def student_from_email(email_raw: str, local_part: str, missing_names: str = 'ask'):
+    """Create a roster student from an email, guessing the name from a 'first.last' local part.
 
-    The online CSV is expected to have headers like:
-    Name,Email,Success Rate,Total Points,Obtained Points,Q1,Q2,...
+    Otherwise the name is asked for, or set according to missing_names (see ImportPolicy).
+    """
+    # Try to extract first and last name from email format (first.last)
+    if '.' in local_part:
+        parts = local_part.split('.')
+        first_name = parts[0].capitalize()
+        last_name = parts[1].capitalize() if len(parts) > 1 else ""
+    elif missing_names == 'email':
+        first_name = local_part
+        last_name = ""
+    elif missing_names == 'empty':
+        first_name = ""
+        last_name = ""
+    else:
+        # Email doesn't follow first.last pattern, ask user
+        print(f"\nWarning: '{email_raw}' doesn't follow 'first.last@email.com' pattern")
+        try:
+            name_input = input(f"  Please enter name in 'first last' format for {local_part}: ").strip()
+            name_parts = name_input.split(maxsplit=1)
+            if len(name_parts) >= 2:
+                first_name = name_parts[0].capitalize()
+                last_name = name_parts[1].capitalize()
+            elif len(name_parts) == 1:
+                first_name = name_parts[0].capitalize()
+                last_name = ""
+            else:
+                first_name = ""
+                last_name = ""
+        except EOFError:
+            first_name = ""
+            last_name = ""
 
-    This function reads per-question scores and writes them into results_file using
-    the active questions defined by evaluation and settings.
+    # Keep only the part before '@' for the email in roster
+    return Student(last_name, first_name, local_part)
 
-    If unknown students are found, prompts the user to ignore, add to roster, or override roster.
-    If questions don't match or results.csv doesn't exist, prompts user to name the questions.
+
+class OnlineExport:
+    """Emails and per-question scores of an online grading-export CSV, parsed in one pass.
+
+    The scores are buffered column-wise: one row per line of the export (lines without
+    an email are skipped), one column per question column of the export.
     """
-    # Initialize empty results respecting dropped/given questions
-    results = Results(class_, evaluation, settings)
 
-    # Track unknown students and their data
-    unknown_students = []  # list of tuples: (student_email_raw, local_part, row_data)
+    def __init__(self, path: str, question_numbers: list[int], emails: list[str], scores, skipped_lines: int = 0):
+        self.path = path
+        self.question_numbers = question_numbers  # 0-based question number of each scores column
+        self.emails = emails
+        self.scores = scores
+        self.skipped_lines = skipped_lines
 
-    # Normalize header names (case-insensitive) and detect question columns
-    with open(online_csv_path, mode='r', newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        # Determine the email header key (case-insensitive)
-        fieldnames = reader.fieldnames or []
-        email_key = None
-        question_keys = []  # list of tuples (qnum_zero_based, keyname)
-        for key in fieldnames:
-            if key is None:
-                continue
-            lk = key.strip().lower()
-            if lk == 'email':
-                email_key = key
-            # match Q<number> (e.g. Q1, Q2)
-            if lk.startswith('q') and lk[1:].isdigit():
+    def __repr__(self):
+        return f"OnlineExport(path='{self.path}', questions={len(self.question_numbers)}, lines={len(self.emails)})"
+
+    @classmethod
+    def from_csv(cls, file_path: str):
+        """Parse an export with headers like: Name,Email,Success Rate,Total Points,Obtained Points,Q1,Q2,..."""
+        with open(file_path, mode='r', newline='', encoding='utf-8') as csvfile:
+            reader = csv.reader(csvfile)
+            # Normalize header names (case-insensitive) and detect question columns
+            fieldnames = next(reader, [])
+            email_column = None
+            question_numbers = []
+            question_columns = []
+            for column, key in enumerate(fieldnames):
+                lk = key.strip().lower()
+                if lk == 'email':
+                    email_column = column
+                # match Q<number> (e.g. Q1, Q2)
+                if lk.startswith('q') and lk[1:].isdigit():
+                    question_numbers.append(int(lk[1:]) - 1)
+                    question_columns.append(column)
+
+            if email_column is None:
+                raise ValueError(f'Could not find an Email column in the online CSV {file_path}')
+
+            emails = []
+            scores = array.array('d')
+            skipped_lines = 0
+            for row in reader:
+                raw_email = row[email_column] if email_column < len(row) else ''
+                student_email_raw = raw_email.strip().strip('"\'')
+                if not student_email_raw:
+                    skipped_lines += 1
+                    continue
+                emails.append(student_email_raw)
+                cells = [row[column] if column < len(row) else '' for column in question_columns]
                 try:
-                    qnum = int(lk[1:])
-                    question_keys.append((qnum - 1, key))
+                    # Fast path: every cell is a plain number
+                    line_scores = list(map(float, cells))
                 except ValueError:
-                    pass
-
-        if email_key is None:
-            raise ValueError('Could not find an Email column in the online CSV')
-
-        # Check if questions need to be updated
-        online_question_count = len(question_keys)
-        results_exists = os.path.exists(results_file)
-
-        # Determine if we need to prompt for question names
-        need_question_update = False
-        if not results_exists:
-            print(f"\nNo existing results.csv found.")
-            need_question_update = True
-        elif online_question_count != len(evaluation.questions):
-            print(f"\nQuestion count mismatch:")
-            print(f"  Online CSV has {online_question_count} questions")
-            print(f"  Current evaluation has {len(evaluation.questions)} questions")
-            need_question_update = True
-
-        if need_question_update:
-            print(f"\nPlease provide names for the {online_question_count} questions from the online CSV:")
-            new_questions = []
-            for qidx, _ in sorted(question_keys):
-                qnum = qidx + 1
-                try:
-                    question_name = input(f"  Question {qnum} name: ").strip()
-                    if not question_name:
-                        question_name = f"Question {qnum}"
-                except EOFError:
-                    question_name = f"Question {qnum}"
+                    line_scores = [parse_score(cell) for cell in cells]
+                scores.extend(line_scores)
 
-                # Default values for part, points, and coefficient
-                part = "Part 1"
-                points = 1.0
-                coefficient = 1.0
+        scores = np.frombuffer(scores, dtype=np.float64).reshape(len(emails), len(question_columns))
+        return cls(file_path, question_numbers, emails, scores, skipped_lines)
 
-                # Try to prompt for points
-                try:
-                    points_input = input(f"  Question {qnum} points (default 1.0): ").strip()
-                    if points_input:
-                        points = float(points_input)
-                except (EOFError, ValueError):
-                    points = 1.0
 
-                new_questions.append(Question(part, question_name, points, coefficient))
+def merge_scores(rows, scores, rule: str = 'latest'):
+    """Combine the score lines (one per entry of rows) that belong to the same matrix row.
 
-            # Update the evaluation
-            evaluation.questions = new_questions
-            evaluation.write_to_csv(questions_file)
-            print(f"\nUpdated questions saved to {questions_file}")
+    'latest' keeps the last line, 'max' the highest score of each question and 'sum' adds
+    them up. Returns the distinct rows and their merged scores.
+    """
+    if rule == 'latest':
+        # np.unique returns the first occurrence, so look for it in the reversed lines
+        distinct_rows, reversed_lines = np.unique(rows[::-1], return_index=True)
+        return distinct_rows, scores[len(rows) - 1 - reversed_lines]
+    distinct_rows, inverse = np.unique(rows, return_inverse=True)
+    if rule == 'max':
+        merged = np.full((len(distinct_rows), scores.shape[1]), -np.inf)
+        np.maximum.at(merged, inverse, scores)
+    elif rule == 'sum':
+        merged = np.zeros((len(distinct_rows), scores.shape[1]))
+        np.add.at(merged, inverse, scores)
+    else:
+        raise ValueError(f"Invalid merge rule: '{rule}'")
+    return distinct_rows, merged
+
+
+def import_online_csv_to_results(online_csv_path: str, results_file: str, roster_file: str, questions_file: str, class_: Class, evaluation: Evaluation, settings: GlobalSettings = GlobalSettings.default, policy: Optional[ImportPolicy] = None):
+    """Import an online grading-export CSV and populate results.csv accordingly.
 
-            # Re-initialize results with updated evaluation
-            results = Results(class_, evaluation, settings)
+    See import_online_csvs_to_results.
+    """
+    import_online_csvs_to_results([online_csv_path], results_file, roster_file, questions_file, class_, evaluation, settings, policy)
 
-        for row in reader:
-            raw_email = row.get(email_key, '') or ''
-            student_email_raw = raw_email.strip().strip('"\'')
-            if not student_email_raw:
-                print("Skipping row with empty email")
+
+def import_online_csvs_to_results(online_csv_paths: list[str], results_file: str, roster_file: str, questions_file: str, class_: Class, evaluation: Evaluation, settings: GlobalSettings = GlobalSettings.default, policy: Optional[ImportPolicy] = None):
+    """Import one or more online grading-export CSVs and populate results.csv accordingly.
+
+    The online CSVs are expected to have headers like:
+    Name,Email,Success Rate,Total Points,Obtained Points,Q1,Q2,...
+    and must all have the same question columns.
+
+    This function reads per-question scores and writes them into results_file using
+    the active questions defined by evaluation and settings. Scores of a student found
+    on several lines (in one or several exports) are merged with policy.merge.
+
+    If unknown students are found, prompts the user to ignore, add to roster, or override roster.
+    If questions don't match or results.csv doesn't exist, prompts user to name the questions.
+    The policy (settings.import_policy by default) can make these decisions in advance.
+
+    Each export is read only once (in parallel when there are several), and results.csv
+    is written once at the end.
+    """
+    policy = policy or settings.import_policy
+
+    # Parse every export once, in parallel when there are several
+    if len(online_csv_paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(len(online_csv_paths), os.cpu_count() or 1)) as executor:
+            exports = list(executor.map(OnlineExport.from_csv, online_csv_paths))
+    else:
+        exports = [OnlineExport.from_csv(path) for path in online_csv_paths]
+
+    for export in exports:
+        if export.skipped_lines:
+            print(f"Skipping {export.skipped_lines} row(s) with empty email in {export.path}")
+        if sorted(export.question_numbers) != sorted(exports[0].question_numbers):
+            raise ValueError(f"{export.path} and {exports[0].path} do not have the same question columns")
+    question_numbers = exports[0].question_numbers
+
+    # Check if questions need to be updated
+    online_question_count = len(question_numbers)
+    results_exists = os.path.exists(results_file)
+
+    # Determine if we need to prompt for question names
+    need_question_update = False
+    if not results_exists:
+        print(f"\nNo existing results.csv found.")
+        need_question_update = True
+    elif online_question_count != len(evaluation.questions):
+        print(f"\nQuestion count mismatch:")
+        print(f"  Online CSV has {online_question_count} questions")
+        print(f"  Current evaluation has {len(evaluation.questions)} questions")
+        need_question_update = True
+
+    if need_question_update and policy.question_mismatch == 'fail':
+        raise ValueError(f"The questions of {exports[0].path} do not match the current questions (import policy: fail)")
+
+    if need_question_update:
+        if policy.question_mismatch == 'ask':
+            print(f"\nPlease provide names for the {online_question_count} questions from the online CSV:")
+        new_questions = []
+        for qidx in sorted(question_numbers):
+            qnum = qidx + 1
+            if policy.question_mismatch == 'default':
+                new_questions.append(Question("Part 1", f"Question {qnum}", 1.0, 1.0))
                 continue
+            try:
+                question_name = input(f"  Question {qnum} name: ").strip()
+                if not question_name:
+                    question_name = f"Question {qnum}"
+            except EOFError:
+                question_name = f"Question {qnum}"
+
+            # Default values for part, points, and coefficient
+            part = "Part 1"
+            points = 1.0
+            coefficient = 1.0
+
+            # Try to prompt for points
+            try:
+                points_input = input(f"  Question {qnum} points (default 1.0): ").strip()
+                if points_input:
+                    points = float(points_input)
+            except (EOFError, ValueError):
+                points = 1.0
+
+            new_questions.append(Question(part, question_name, points, coefficient))
+
+        # Update the evaluation
+        evaluation.set_questions(new_questions)
+        evaluation.write_to_csv(questions_file)
+        print(f"\nUpdated questions saved to {questions_file}")
 
-            # Use only the local-part (before '@') to match roster entries
-            local_part = student_email_raw.split('@')[0]
+    # Initialize empty results respecting dropped/given questions
+    results = Results(class_, evaluation, settings)
 
-            # Find matching key in results.scores. roster may contain only local-part entries.
-            matched_email = None
-            if local_part in results.scores:
-                matched_email = local_part
-            elif student_email_raw in results.scores:
-                matched_email = student_email_raw
+    # Question columns to import, skipping out-of-range question numbers and
+    # dropped (inactive) questions
+    import_uids = []
+    for qidx in question_numbers:
+        if 0 <= qidx < len(evaluation.questions) and evaluation.question_uids[qidx] in results.col_index:
+            import_uids.append(evaluation.question_uids[qidx])
+
+    # Lines of all exports, in order, with their scores for the imported questions
+    # (raw points, coefficients are applied later)
+    export_emails = []
+    export_scores = []
+    for export in exports:
+        export_columns = {evaluation.question_uids[qidx]: column for column, qidx in enumerate(export.question_numbers) if 0 <= qidx < len(evaluation.questions)}
+        export_emails.extend(export.emails)
+        export_scores.append(export.scores[:, [export_columns[uid] for uid in import_uids]])
+    export_scores = np.concatenate(export_scores)
+
+    def fill_results(results):
+        """Copy the merged scores of the lines matching a roster student into results
+        and return the emails of the other lines."""
+        student_rows = []
+        student_lines = []
+        unknown_emails = []
+        for line, email in enumerate(export_emails):
+            # The roster may contain only the local-part (before '@') of emails
+            student_row = results.row_index.get(email.split('@')[0], results.row_index.get(email))
+            if student_row is None:
+                unknown_emails.append(email)
             else:
-                # try stripping extra quotes and whitespace
-                s2 = student_email_raw.strip('"\'')
-                lp2 = s2.split('@')[0]
-                if lp2 in results.scores:
-                    matched_email = lp2
-                elif s2 in results.scores:
-                    matched_email = s2
-
-            if not matched_email:
-                # Collect unknown student data for later processing
-                unknown_students.append((student_email_raw, local_part, row))
-                continue
+                student_rows.append(student_row)
+                student_lines.append(line)
+        if student_rows:
+            rows, scores = merge_scores(np.array(student_rows), export_scores[student_lines], policy.merge)
+            results.matrix[np.ix_(rows, [results.col_index[uid] for uid in import_uids])] = scores
+            results.invalidate_cache()
+        # A student may appear in several lines
+        return list(dict.fromkeys(unknown_emails))
 
-            for qidx, key in question_keys:
-                # Skip out-of-range question numbers
-                if qidx < 0 or qidx >= len(evaluation.questions):
-                    continue
-                uid = evaluation.get_question_uid(qidx)
-                if uid not in results.scores[matched_email]:
-                    # dropped question or not active
-                    continue
-                raw = (row.get(key, '') or '').strip()
-                if raw == '':
-                    score = 0.0
-                else:
-                    # Try to parse numeric value; some exports may include non-numeric chars
-                    try:
-                        score = float(raw)
-                    except ValueError:
-                        # Remove any non-digit characters (like % or quotes) and try again
-                        cleaned = ''.join(ch for ch in raw if (ch.isdigit() or ch in '.-'))
-                        score = float(cleaned) if cleaned != '' else 0.0
-                # Set the raw points (Results expects raw points, coefficients are applied later)
-                results.set_score(matched_email, uid, score)
+    unknown_emails = fill_results(results)
 
     # Handle unknown students if any were found
-    if unknown_students:
-        print(f"\nFound {len(unknown_students)} unknown student(s) not in roster:")
-        for email_raw, local, _ in unknown_students:
+    if unknown_emails:
+        print(f"\nFound {len(unknown_emails)} unknown student(s) not in roster:")
+        for email_raw in unknown_emails:
             print(f"  - {email_raw}")
 
-        print("\nWhat would you like to do with these unknown students?")
-        print("  1. Ignore them (skip importing their scores)")
-        print("  2. Add them to the roster (and import their scores)")
-        print("  3. Override the roster with only these students")
+        if policy.unknown_students == 'ask':
+            print("\nWhat would you like to do with these unknown students?")
+            print("  1. Ignore them (skip importing their scores)")
+            print("  2. Add them to the roster (and import their scores)")
+            print("  3. Override the roster with only these students")
 
-        try:
-            choice = input("Enter your choice (1/2/3): ").strip()
-        except EOFError:
-            choice = '1'
-
-        if choice == '2':
-            # Add unknown students to the roster
-            print("\nAdding unknown students to roster...")
-            for email_raw, local, row_data in unknown_students:
-                # Keep only the part before '@' for the email in roster
-                roster_email = local
-
-                # Try to extract first and last name from email format (first.last)
-                if '.' in local:
-                    parts = local.split('.')
-                    first_name = parts[0].capitalize()
-                    last_name = parts[1].capitalize() if len(parts) > 1 else ""
-                else:
-                    # Email doesn't follow first.last pattern, ask user
-                    print(f"\nWarning: '{email_raw}' doesn't follow 'first.last@email.com' pattern")
-                    try:
-                        name_input = input(f"  Please enter name in 'first last' format for {roster_email}: ").strip()
-                        name_parts = name_input.split(maxsplit=1)
-                        if len(name_parts) >= 2:
-                            first_name = name_parts[0].capitalize()
-                            last_name = name_parts[1].capitalize()
-                        elif len(name_parts) == 1:
-                            first_name = name_parts[0].capitalize()
-                            last_name = ""
-                        else:
-                            first_name = ""
-                            last_name = ""
-                    except EOFError:
-                        first_name = ""
-                        last_name = ""
+            try:
+                choice = input("Enter your choice (1/2/3): ").strip()
+            except EOFError:
+                choice = '1'
+        else:
+            choice = {'ignore': '1', 'add': '2', 'override': '3'}[policy.unknown_students]
 
-                new_student = Student(last_name, first_name, roster_email)
+        if choice in ('2', '3'):
+            if choice == '2':
+                print("\nAdding unknown students to roster...")
+            else:
+                print("\nOverriding roster with unknown students only...")
+                class_.set_students([])
+            for email_raw in unknown_emails:
+                new_student = student_from_email(email_raw, email_raw.split('@')[0], policy.missing_names)
                 class_.add_student(new_student)
-                print(f"  Added: {first_name} {last_name} ({roster_email})")
+                print(f"  Added: {new_student.first_name} {new_student.last_name} ({new_student.email})")
 
             # Save the updated roster
             class_.write_to_csv(roster_file)
-            print(f"Updated roster saved to {roster_file}")
+            if choice == '2':
+                print(f"Updated roster saved to {roster_file}")
+            else:
+                print(f"Roster overwritten and saved to {roster_file}")
 
-            # Re-initialize results with the updated class to include new students
+            # Re-initialize results with the updated class and fill it again from the buffer
             results = Results(class_, evaluation, settings)
+            fill_results(results)
 
-            # Re-process the entire CSV including the previously unknown students
-            with open(online_csv_path, mode='r', newline='', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    raw_email = row.get(email_key, '') or ''
-                    student_email_raw = raw_email.strip().strip('"\'')
-                    if not student_email_raw:
-                        continue
+        else:
+            # Choice 1 or invalid choice: ignore unknown students
+            print("\nIgnoring unknown students. Their scores will not be imported.")
 
-                    local_part = student_email_raw.split('@')[0]
-                    matched_email = None
-                    if local_part in results.scores:
-                        matched_email = local_part
-                    elif student_email_raw in results.scores:
-                        matched_email = student_email_raw
+    # Ensure 'given' questions are applied after import as well
+    results.apply_given_questions()
 
-                    if not matched_email:
-                        continue
+    # Write updated results back to results_file
+    results.write_results_to_csv(results_file)
+    print(f"Imported online results from {', '.join(online_csv_paths)} and wrote to {results_file}")
+
+
+# STORE
+
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    position INTEGER PRIMARY KEY,
+    last_name TEXT,
+    first_name TEXT,
+    email TEXT
+);
+CREATE INDEX IF NOT EXISTS students_email ON students (email);
+CREATE TABLE IF NOT EXISTS questions (
+    position INTEGER PRIMARY KEY,
+    uid TEXT NOT NULL UNIQUE,
+    part TEXT NOT NULL,
+    name TEXT NOT NULL,
+    points REAL NOT NULL,
+    coefficient REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS questions_part ON questions (part);
+CREATE TABLE IF NOT EXISTS scores (
+    email TEXT NOT NULL,
+    uid TEXT NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (email, uid)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS scores_uid ON scores (uid);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    file_type TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+"""
+
+
+def file_state(file_path: str):
+    """(size, modification time, hash) of a file, None if it is missing."""
+    try:
+        with open(file_path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns, digest
+
+
+class GradingStore:
+    """The roster, questions, settings and scores of a grading folder in one SQLite database.
+
+    The four files stay authoritative: the state (size, modification time and hash) of each
+    file is recorded when it is imported or written, and every write transaction first
+    imports the files changed since then (see sync_folder), so edits of the files are never
+    overwritten. Edits (see set_score) are transactions, so concurrent writers wait for each
+    other instead of overwriting each other's results.csv, and scores can be looked up by
+    student, question or part through the indexes.
+    """
 
-                    for qidx, key in question_keys:
-                        if qidx < 0 or qidx >= len(evaluation.questions):
-                            continue
-                        uid = evaluation.get_question_uid(qidx)
-                        if uid not in results.scores[matched_email]:
-                            continue
-                        raw = (row.get(key, '') or '').strip()
-                        if raw == '':
-                            score = 0.0
-                        else:
-                            try:
-                                score = float(raw)
-                            except ValueError:
-                                cleaned = ''.join(ch for ch in raw if (ch.isdigit() or ch in '.-'))
-                                score = float(cleaned) if cleaned != '' else 0.0
-                        results.set_score(matched_email, uid, score)
-
-        elif choice == '3':
-            # Override roster with only unknown students
-            print("\nOverriding roster with unknown students only...")
-            class_.students = []
-            for email_raw, local, row_data in unknown_students:
-                roster_email = local
-
-                # Try to extract first and last name from email format (first.last)
-                if '.' in local:
-                    parts = local.split('.')
-                    first_name = parts[0].capitalize()
-                    last_name = parts[1].capitalize() if len(parts) > 1 else ""
-                else:
-                    # Email doesn't follow first.last pattern, ask user
-                    print(f"\nWarning: '{email_raw}' doesn't follow 'first.last@email.com' pattern")
-                    try:
-                        name_input = input(f"  Please enter name in 'first last' format for {roster_email}: ").strip()
-                        name_parts = name_input.split(maxsplit=1)
-                        if len(name_parts) >= 2:
-                            first_name = name_parts[0].capitalize()
-                            last_name = name_parts[1].capitalize()
-                        elif len(name_parts) == 1:
-                            first_name = name_parts[0].capitalize()
-                            last_name = ""
-                        else:
-                            first_name = ""
-                            last_name = ""
-                    except EOFError:
-                        first_name = ""
-                        last_name = ""
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        # Writers wait up to 30 s for each other; transactions are managed explicitly
+        self.connection = sqlite3.connect(file_path, timeout=30.0, isolation_level=None)
+        # Readers are not blocked by a writer
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(STORE_SCHEMA)
 
-                new_student = Student(last_name, first_name, roster_email)
-                class_.add_student(new_student)
-                print(f"  Added: {first_name} {last_name} ({roster_email})")
+    def __repr__(self):
+        return f"GradingStore(file_path='{self.file_path}')"
 
-            # Save the new roster
-            class_.write_to_csv(roster_file)
-            print(f"Roster overwritten and saved to {roster_file}")
+    def close(self):
+        self.connection.close()
 
-            # Re-initialize results with the new class
-            results = Results(class_, evaluation, settings)
+    @contextlib.contextmanager
+    def transaction(self):
+        """Write transaction, taking the database lock from the start (other writers wait)."""
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.connection
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+    def import_folder(self, folder):
+        """Replace the content of the store with the files of a GradingFolder."""
+        with self.transaction() as connection:
+            for name in ('students', 'questions', 'scores', 'settings', 'files'):
+                connection.execute(f"DELETE FROM {name}")
+            for file_type in FILE_TYPES:
+                self.import_file(folder, file_type)
+
+    def import_file(self, folder, file_type: str):
+        """Replace the content of the store coming from one file of folder (see FILE_TYPES),
+        within the current transaction, and record the state of the file."""
+        state = file_state(folder.files[file_type])
+        if state is None:
+            raise ValueError(f"Cannot import {folder.files[file_type]}: file is missing")
+        connection = self.connection
+        if file_type == 'roster':
+            class_ = Class.from_csv(folder.class_name, folder.roster_file)
+            connection.execute("DELETE FROM students")
+            connection.executemany(
+                "INSERT INTO students VALUES (?, ?, ?, ?)",
+                ((position, student.last_name, student.first_name, student.email) for position, student in enumerate(class_.students)))
+        elif file_type == 'questions':
+            evaluation = Evaluation.from_csv(folder.evaluation_name, folder.questions_file)
+            connection.execute("DELETE FROM questions")
+            connection.executemany(
+                "INSERT INTO questions VALUES (?, ?, ?, ?, ?, ?)",
+                ((position, uid, question.part, question.title, question.points, question.coefficient)
+                 for position, (uid, question) in enumerate(zip(evaluation.question_uids, evaluation.questions))))
+        elif file_type == 'settings':
+            settings = GlobalSettings.from_json(folder.settings_file)
+            connection.execute("DELETE FROM settings")
+            connection.executemany(
+                "INSERT INTO settings VALUES (?, ?)",
+                ((key, json.dumps(value)) for key, value in settings.to_dict().items()))
+        else:
+            table = ResultsTable.from_csv(folder.results_file)
+            # Scores of the questions that are not in results.csv (dropped) are kept
+            connection.executemany("DELETE FROM scores WHERE uid = ?", ((uid,) for uid in table.question_uids))
+            # Later rows override earlier ones for the same email, like in ResultsTable. Cells
+            # that are not numbers are left out (missing scores are 0)
+            connection.executemany(
+                "INSERT OR REPLACE INTO scores VALUES (?, ?, ?)",
+                ((email, uid, score) for row, (email, scores) in enumerate(zip(table.emails, table.scores.tolist()))
+                 for column, (uid, score) in enumerate(zip(table.question_uids, scores)) if (row, column) not in table.invalid_cells))
+        self.record_file(file_type, state)
+
+    def record_file(self, file_type: str, state):
+        """Record the state (see file_state) of a file just imported or written."""
+        self.connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", (file_type,) + tuple(state))
+
+    def sync_folder(self, folder):
+        """Import the files of folder that changed since they were last imported or written,
+        within the current transaction. Missing files are left to be written."""
+        recorded = {row[0]: tuple(row[1:]) for row in self.connection.execute("SELECT file_type, size, mtime_ns, digest FROM files")}
+        for file_type in FILE_TYPES:
+            state = file_state(folder.files[file_type])
+            if state is not None and state != recorded.get(file_type):
+                self.import_file(folder, file_type)
+
+    def load(self, class_name: str = "Class", evaluation_name: str = "Evaluation"):
+        """(Class, Evaluation, GlobalSettings, ResultsTable) read from the store.
+
+        The table has the columns results.csv would have (the questions that are not
+        dropped) and one row per student of the roster; missing scores are 0.
+        """
+        # One read transaction, so that the four parts match
+        self.connection.execute("BEGIN")
+        try:
+            return self.read(class_name, evaluation_name)
+        finally:
+            self.connection.execute("COMMIT")
+
+    def read(self, class_name: str, evaluation_name: str):
+        """See load, within the current transaction."""
+        class_ = Class(class_name)
+        class_.set_students([Student(*row) for row in self.connection.execute(
+            "SELECT last_name, first_name, email FROM students ORDER BY position")])
+        evaluation = Evaluation(evaluation_name, [Question(*row) for row in self.connection.execute(
+            "SELECT part, name, points, coefficient FROM questions ORDER BY position")])
+        settings = GlobalSettings.from_dict({key: json.loads(value) for key, value in self.connection.execute(
+            "SELECT key, value FROM settings")})
+        score_rows = self.connection.execute("SELECT email, uid, score FROM scores").fetchall()
+
+        question_uids = [evaluation.question_uids[i] for i in evaluation.active_question_indices(settings.dropped_questions)]
+        emails = list(class_.email_index)
+        row_index = {email: row for row, email in enumerate(emails)}
+        col_index = {uid: col for col, uid in enumerate(question_uids)}
+        scores = np.zeros((len(emails), len(question_uids)))
+        for email, uid, score in score_rows:
+            if email in row_index and uid in col_index:
+                scores[row_index[email], col_index[uid]] = score
+        return class_, evaluation, settings, ResultsTable(question_uids, emails, scores)
+
+    def export_folder(self, folder):
+        """Write the four files of a GradingFolder from the store, after importing the files
+        that changed since the last import or export (see sync_folder)."""
+        with self.transaction():
+            self.sync_folder(folder)
+            class_, evaluation, settings, table = self.read(folder.class_name, folder.evaluation_name)
+            class_.write_to_csv(folder.roster_file)
+            self.record_file('roster', file_state(folder.roster_file))
+            evaluation.write_to_csv(folder.questions_file)
+            self.record_file('questions', file_state(folder.questions_file))
+            settings.to_json(folder.settings_file)
+            self.record_file('settings', file_state(folder.settings_file))
+            self.write_results(class_, evaluation, settings, table, folder.results_file)
+
+    def write_results(self, class_: Class, evaluation: Evaluation, settings: GlobalSettings, table: ResultsTable, file_path: str):
+        """Write the scores of a table read from the store (see load) as results.csv, within
+        the current transaction."""
+        results = Results(class_, evaluation, settings)
+        # Same rows and columns as the matrix. The stored scores are written as they are:
+        # 'given' questions are applied when results.csv is read
+        results.matrix[:] = table.scores
+        results.write_results_to_csv(file_path)
+        self.record_file('results', file_state(file_path))
+
+    def set_score(self, email: str, question_uid: str, score: float, folder=None):
+        """Set the score of a student for a question, and rewrite the results.csv of folder
+        (a GradingFolder) in the same transaction, so that it never misses a concurrent edit.
+
+        The files of folder changed since the last sync are imported first (see sync_folder).
+        """
+        with self.transaction() as connection:
+            if folder is not None:
+                self.sync_folder(folder)
+            if connection.execute("SELECT 1 FROM students WHERE email = ?", (email,)).fetchone() is None:
+                raise ValueError(f"Unknown student {email}")
+            if connection.execute("SELECT 1 FROM questions WHERE uid = ?", (question_uid,)).fetchone() is None:
+                raise ValueError(f"Unknown question {question_uid}")
+            connection.execute("INSERT OR REPLACE INTO scores VALUES (?, ?, ?)", (email, question_uid, score))
+            if folder is not None:
+                # Read within the transaction: includes every committed edit
+                class_, evaluation, settings, table = self.read(folder.class_name, folder.evaluation_name)
+                self.write_results(class_, evaluation, settings, table, folder.results_file)
+
+    def part_scores(self, part: str):
+        """(email, question UID, score) of every score of the questions of a part."""
+        return self.connection.execute(
+            "SELECT scores.email, scores.uid, scores.score FROM questions JOIN scores ON scores.uid = questions.uid "
+            "WHERE questions.part = ? ORDER BY questions.position", (part,)).fetchall()
+
+    def students_below(self, grade: float = 4.0):
+        """Emails of the students whose grade (see Results.compute_all_grades) is below grade."""
+        class_, evaluation, settings, table = self.load()
+        results = Results(class_, evaluation, settings)
+        results.fill_from_table(table)
+        grades = results.compute_all_grades()
+        return [email for email, student_grade in zip(results.emails, grades.tolist()) if student_grade < grade]
+
+
+# WATCHING
+
+FILE_TYPES = ('results', 'roster', 'questions', 'settings')
+
+# Seconds between two checks of the watched files
+POLL_INTERVAL = 0.5
+# Seconds the watched files must stay unchanged before regenerating, so that bursts of
+# writes (several files synced at once, editors writing a temp file then renaming it)
+# trigger a single regeneration
+DEBOUNCE_DELAY = 0.3
+
+# Changed scores listed by the watcher after each reload (see ScoreJournal)
+REPORTED_CHANGES = 10
+
+
+class InotifyWatcher:
+    """Waits for changes to files of a folder with Linux inotify (called through libc)."""
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len (followed by the name)
+
+    def __init__(self, folder_path: str):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        # Watch the folder rather than the files, so that files replaced by a rename are still seen
+        mask = self.IN_MODIFY | self.IN_ATTRIB | self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder_path), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f'inotify_add_watch failed for {folder_path}')
 
-            # Process only the unknown students
-            with open(online_csv_path, mode='r', newline='', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    raw_email = row.get(email_key, '') or ''
-                    student_email_raw = raw_email.strip().strip('"\'')
-                    if not student_email_raw:
-                        continue
+    @classmethod
+    def create(cls, folder_path: str):
+        """Return a watcher for folder_path, or None if inotify is not available (e.g. not on Linux)."""
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            return cls(folder_path)
+        except (OSError, AttributeError):
+            return None
 
-                    local_part = student_email_raw.split('@')[0]
-                    matched_email = None
-                    if local_part in results.scores:
-                        matched_email = local_part
-                    elif student_email_raw in results.scores:
-                        matched_email = student_email_raw
+    def wait(self, names, timeout: Optional[float] = None):
+        """Block until one of the files in names changes, or for at most timeout seconds.
 
-                    if not matched_email:
-                        continue
+        Returns True if such a change happened, False on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                return False
+            data = os.read(self.fd, 64 * 1024)
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+                offset += self.EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                # On queue overflow events were lost, so assume anything may have changed
+                if name in names or mask & self.IN_Q_OVERFLOW:
+                    return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ScoreJournal:
+    """The last versions of the scores changed by incremental reloads of a grading folder.
+
+    Each version is numbered (self.version is the latest) and holds the cells changed by one
+    reload of results.csv, as (email, question UID, old score, new score) tuples; only the
+    max_versions latest are kept. A consumer remembers the version it has seen and asks for
+    the cells changed since then (see changes_since).
+    """
 
-                    for qidx, key in question_keys:
-                        if qidx < 0 or qidx >= len(evaluation.questions):
-                            continue
-                        uid = evaluation.get_question_uid(qidx)
-                        if uid not in results.scores[matched_email]:
-                            continue
-                        raw = (row.get(key, '') or '').strip()
-                        if raw == '':
-                            score = 0.0
-                        else:
-                            try:
-                                score = float(raw)
-                            except ValueError:
-                                cleaned = ''.join(ch for ch in raw if (ch.isdigit() or ch in '.-'))
-                                score = float(cleaned) if cleaned != '' else 0.0
-                        results.set_score(matched_email, uid, score)
+    def __init__(self, max_versions: int = 100):
+        self.versions = collections.deque(maxlen=max_versions)
+        self.version = 0
+
+    def record(self, changes):
+        if changes:
+            self.version += 1
+            self.versions.append((self.version, time.time(), changes))
+
+    def changes_since(self, version: int):
+        """Cells changed after version, one per cell with its oldest old score and newest new
+        score (cells changed back to their old score are left out). None when versions after
+        version are no longer kept (everything may have changed)."""
+        if version < self.version - len(self.versions):
+            return None
+        cells = {}
+        for number, _, changes in self.versions:
+            if number > version:
+                for email, uid, old, new in changes:
+                    cells[email, uid] = (cells[email, uid][0] if (email, uid) in cells else old, new)
+        return [(email, uid, old, new) for (email, uid), (old, new) in cells.items() if old != new]
 
-        else:
-            # Choice 1 or invalid choice: ignore unknown students
-            print("\nIgnoring unknown students. Their scores will not be imported.")
+    def __repr__(self):
+        return f"ScoreJournal(version={self.version}, versions={len(self.versions)}, changes={sum(len(changes) for _, _, changes in self.versions)})"
+
+
+class GradingFolder:
+    """The grading files of one folder, reloaded incrementally as they change."""
+
+    def __init__(self, folder_path: str, class_name: str = "Class", evaluation_name: str = "Evaluation"):
+        self.folder_path = folder_path
+        self.class_name = class_name
+        self.evaluation_name = evaluation_name
+
+        self.roster_file = os.path.join(folder_path, "roster.csv")
+        self.questions_file = os.path.join(folder_path, "questions.csv")
+        self.settings_file = os.path.join(folder_path, "settings.json")
+        self.results_file = os.path.join(folder_path, "results.csv")
+        self.plots_file = os.path.join(folder_path, "plots.pdf")
+        self.anonym_plots_file = os.path.join(folder_path, "plots_anonym.pdf")
+        self.stats_file = os.path.join(folder_path, "results_with_stats.csv")
+        # Score matrix of the memory_mapped_scores setting
+        self.matrix_file = os.path.join(folder_path, ".scores.npy")
+        # Optional SQLite store of the four files (see GradingStore)
+        self.store_file = os.path.join(folder_path, "grading.sqlite")
+        self.files = {
+            'results': self.results_file,
+            'roster': self.roster_file,
+            'questions': self.questions_file,
+            'settings': self.settings_file
+        }
+
+        # Set by start_watching; when None, wait_for_changes polls the modification times
+        self.watcher = None
+
+        self.class_ = None
+        self.evaluation = None
+        self.settings = None
+        # Parsed results.csv, kept so that other files can change without re-parsing it
+        self.table = None
+        self.results = None
+        # Score changes applied without rebuilding results
+        self.journal = ScoreJournal()
+        # Emails and question UIDs of results.csv whose scores changed in the last reload,
+        # None when results were rebuilt (everything changed)
+        self.changed_students = None
+        self.changed_questions = None
+
+    def modified_times(self):
+        """Modification time of each watched file, None for files that are (temporarily) missing."""
+        times = {}
+        for file_type, path in self.files.items():
+            try:
+                times[file_type] = os.path.getmtime(path)
+            except FileNotFoundError:
+                times[file_type] = None
+        return times
+
+    def start_watching(self):
+        """Wait for changes with inotify when available, falling back to polling otherwise."""
+        self.watcher = InotifyWatcher.create(self.folder_path)
+
+    def stop_watching(self):
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+
+    def wait_for_changes(self, last_modified_times, poll_interval: float = POLL_INTERVAL, debounce_delay: float = DEBOUNCE_DELAY):
+        """Block until some watched files change and then stay unchanged for debounce_delay.
+
+        Returns the set of changed file types and the new modification times.
+        """
+        watched_names = {os.path.basename(path) for path in self.files.values()}
+
+        current_modified_times = self.modified_times()
+        while current_modified_times == last_modified_times:
+            if self.watcher is None:
+                time.sleep(poll_interval)
+            else:
+                self.watcher.wait(watched_names)
+            current_modified_times = self.modified_times()
 
-    # Ensure 'given' questions are applied after import as well
-    for qnum in getattr(results.settings, 'given_questions', []):
-        idx = qnum - 1
-        if 0 <= idx < len(evaluation.questions):
-            uid = evaluation.get_question_uid(idx)
-            if uid in next(iter(results.scores.values()), {}):
-                full_score = evaluation.questions[idx].points
-                for student_email in results.scores:
-                    results.scores[student_email][uid] = full_score
+        # Wait for the burst of writes to settle (and for renamed files to reappear)
+        while True:
+            if self.watcher is None:
+                time.sleep(debounce_delay)
+                settled_modified_times = self.modified_times()
+                settled = settled_modified_times == current_modified_times
+            else:
+                settled = not self.watcher.wait(watched_names, debounce_delay)
+                settled_modified_times = self.modified_times()
+            current_modified_times = settled_modified_times
+            if settled and None not in current_modified_times.values():
+                break
+
+        changed = {file_type for file_type in FILE_TYPES if current_modified_times[file_type] != last_modified_times[file_type]}
+        return changed, current_modified_times
+
+    def reload(self, changed=FILE_TYPES):
+        """Reload the changed file types (see FILE_TYPES) and update self.results.
+
+        Results is only rebuilt when its structure changes (roster, questions, results.csv
+        columns, dropped or given questions). Otherwise a settings change only replaces
+        the settings (grades are recomputed lazily) and a results change only refills
+        the rows of the students whose line changed (see changed_students and changed_questions).
+        """
+        rebuild = self.results is None
+        if 'roster' in changed:
+            self.class_ = Class.from_csv(self.class_name, self.roster_file)
+            rebuild = True
+        if 'questions' in changed:
+            self.evaluation = Evaluation.from_csv(self.evaluation_name, self.questions_file)
+            rebuild = True
+        if 'settings' in changed:
+            settings = GlobalSettings.from_json(self.settings_file)
+            if self.settings is None or settings.dropped_questions != self.settings.dropped_questions \
+                    or settings.given_questions != self.settings.given_questions \
+                    or settings.memory_mapped_scores != self.settings.memory_mapped_scores:
+                rebuild = True
+            self.settings = settings
+
+        changed_emails = []
+        changed_questions = []
+        if 'results' in changed:
+            # With memory_mapped_scores, the scores of the table stay in its cache file
+            table = ResultsTable.from_csv(self.results_file, mmap_mode='r' if self.settings.memory_mapped_scores else None)
+            if self.table is None or table.question_uids != self.table.question_uids:
+                rebuild = True
+            else:
+                changed_emails, changed_questions = table.diff(self.table)
+            self.table = table
+
+        if rebuild:
+            self.changed_students = self.changed_questions = None
+            matrix_path = self.matrix_file if self.settings.memory_mapped_scores else None
+            self.results = Results(self.class_, self.evaluation, self.settings, matrix_path)
+            self.results.fill_from_table(self.table)
+        else:
+            self.changed_students, self.changed_questions = changed_emails, changed_questions
+            self.results.settings = self.settings
+            if changed_emails:
+                self.journal.record(self.results.fill_from_table(self.table, changed_emails))
+        return self.results
+
+    def is_complete(self):
+        """True if all the watched files exist."""
+        return all(os.path.exists(path) for path in self.files.values())
+
+    def write_outputs(self, executor=None):
+        """Regenerate both PDFs and results_with_stats.csv from the current results.
+
+        With an executor the three outputs are written concurrently (see submit_outputs).
+        """
+        if executor is None:
+            self.results.plot_all_statistics(self.plots_file)
+            self.results.plot_all_statistics(self.anonym_plots_file, show_individual=False)
+            self.results.write_results_with_stats(self.stats_file)
+        else:
+            for future in self.submit_outputs(executor):
+                future.result()
+
+    def submit_outputs(self, executor):
+        """Submit the rendering of both PDFs and the writing of results_with_stats.csv to
+        executor, returning their futures.
+
+        The statistics are computed once here and shipped to the workers with the results;
+        only the stats CSV job receives the score matrix.
+        """
+        self.results.precompute()
+        plotted = self.results.without_matrix()
+        return [
+            executor.submit(plotted.plot_all_statistics, self.plots_file),
+            executor.submit(plotted.plot_all_statistics, self.anonym_plots_file, False),
+            executor.submit(self.results.write_results_with_stats, self.stats_file)
+        ]
+
+
+class GradingDaemon:
+    """Watches many grading folders from one process.
+
+    Each folder keeps its own GradingFolder (and cached Results) in this process, where
+    reloading is cheap; its outputs are rendered by a bounded pool of worker processes. A folder
+    that changes again while it is being rendered is rendered once more afterwards.
+    """
 
-    # Write updated results back to results_file
-    results.write_results_to_csv(results_file)
-    print(f"Imported online results from {online_csv_path} and wrote to {results_file}")
+    def __init__(self, folder_paths, max_workers: Optional[int] = None):
+        self.folders = [GradingFolder(folder_path) for folder_path in folder_paths]
+        self.max_workers = max_workers
 
+    @staticmethod
+    def find_folders(paths):
+        """Grading folders among paths: each path is either a grading folder or a root whose
+        direct subfolders are searched for grading folders."""
+        folder_paths = []
+        for path in paths:
+            if GradingFolder(path).is_complete():
+                folder_paths.append(path)
+            elif os.path.isdir(path):
+                for entry in sorted(os.scandir(path), key=lambda entry: entry.name):
+                    if entry.is_dir() and GradingFolder(entry.path).is_complete():
+                        folder_paths.append(entry.path)
+            else:
+                print(f"Skipping '{path}': not a folder")
+        return folder_paths
+
+    def wait(self, timeout: Optional[float]):
+        """Block until a watched file of any folder changes, or for at most timeout seconds."""
+        watchers = {folder.watcher.fd: folder for folder in self.folders if folder.watcher is not None}
+        if len(watchers) < len(self.folders):
+            # Some folders are polled, never block longer than the poll interval
+            timeout = POLL_INTERVAL if timeout is None else min(timeout, POLL_INTERVAL)
+        if not watchers:
+            time.sleep(timeout)
+            return
+        ready, _, _ = select.select(list(watchers), [], [], timeout)
+        for fd in ready:
+            # Drain the events, changes are detected from the modification times
+            folder = watchers[fd]
+            watched_names = {os.path.basename(path) for path in folder.files.values()}
+            while folder.watcher.wait(watched_names, 0):
+                pass
+
+    def run(self):
+        for folder in self.folders:
+            folder.start_watching()
+        print(f"Watching {len(self.folders)} folder(s): {', '.join(folder.folder_path for folder in self.folders)}")
+
+        last_modified_times = {folder: None for folder in self.folders}
+        pending = {folder: set(FILE_TYPES) for folder in self.folders}  # file types to reload
+        last_change = {folder: 0.0 for folder in self.folders}
+        running = {}  # folder -> futures of its outputs
+
+        executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        try:
+            while True:
+                now = time.monotonic()
+                for folder in self.folders:
+                    current_modified_times = folder.modified_times()
+                    previous_modified_times = last_modified_times[folder]
+                    if current_modified_times != previous_modified_times:
+                        if folder.results is None:
+                            # Not loaded yet, or the last reload failed
+                            pending[folder] = set(FILE_TYPES)
+                        else:
+                            pending[folder] |= {file_type for file_type in FILE_TYPES if current_modified_times[file_type] != previous_modified_times[file_type]}
+                        last_modified_times[folder] = current_modified_times
+                        last_change[folder] = now
+
+                # Report finished renderings
+                for folder, futures in list(running.items()):
+                    if all(future.done() for future in futures):
+                        del running[folder]
+                        errors = [future.exception() for future in futures if future.exception() is not None]
+                        if errors:
+                            print(f"[{folder.folder_path}] Rendering failed: {errors[0]}")
+                        else:
+                            print(f"[{folder.folder_path}] Plots updated and saved to {folder.plots_file}")
 
-def main():
-    usage = "Usage: python grading.py <folder_path> [<online_export.csv>]"
-    if len(sys.argv) < 2:
-        print(usage)
+                # Reload and render folders whose changes have settled
+                for folder in self.folders:
+                    if not pending[folder] or folder in running:
+                        continue
+                    if now - last_change[folder] < DEBOUNCE_DELAY or None in last_modified_times[folder].values():
+                        continue
+                    changed = pending[folder]
+                    pending[folder] = set()
+                    try:
+                        folder.reload(changed)
+                    except Exception as e:
+                        # Keep serving the other folders; the next change of this one reloads everything
+                        print(f"[{folder.folder_path}] Could not reload {', '.join(sorted(changed))}: {e}")
+                        folder.results = None
+                        continue
+                    if folder.modified_times() != last_modified_times[folder]:
+                        # Written again while being read: render once the new change is reloaded
+                        continue
+                    running[folder] = folder.submit_outputs(executor)
+
+                # Sleep until the next change, waking up regularly while work is in progress
+                busy = running or any(pending.values())
+                self.wait(DEBOUNCE_DELAY if busy else None)
+        except KeyboardInterrupt:
+            print("\nStopped watching.")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            for folder in self.folders:
+                folder.stop_watching()
+
+
+def daemon_main(argv):
+    parser = argparse.ArgumentParser(
+        prog='grading.py --daemon',
+        description="Watch many grading folders from one process.")
+    parser.add_argument('paths', nargs='+', metavar='root_or_folder',
+                        help="grading folder, or folder whose direct subfolders are grading folders")
+    parser.add_argument('--workers', type=int, default=None, help="maximum number of rendering processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    folder_paths = GradingDaemon.find_folders(args.paths)
+    if not folder_paths:
+        print("No grading folders found (a grading folder contains roster.csv, questions.csv, settings.json and results.csv).")
         sys.exit(1)
+    GradingDaemon(folder_paths, args.workers).run()
 
-    folder_path = sys.argv[1]
-    online_csv = sys.argv[2] if len(sys.argv) >= 3 else None
+
+def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == '--daemon':
+        daemon_main(sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(
+        prog='grading.py',
+        description="Watch a grading folder and regenerate its plots and statistics, optionally importing an online export first.",
+        epilog="To watch many folders from one process: grading.py --daemon [--workers N] <root_or_folder> [<root_or_folder> ...]")
+    parser.add_argument('folder_path', help="folder that contains (or will contain) the grading files")
+    parser.add_argument('online_csvs', nargs='*', metavar='online_csv',
+                        help="online grading export(s) to import into results.csv; glob patterns are expanded")
+    parser.add_argument('--batch', action='store_true',
+                        help="never prompt: import, regenerate the outputs once and exit. Import decisions left to 'ask' "
+                             "ignore unknown students, fail on question mismatches and leave missing names empty")
+    parser.add_argument('--unknown-students', choices=ImportPolicy.UNKNOWN_STUDENTS, help="overrides the import policy of settings.json")
+    parser.add_argument('--question-mismatch', choices=ImportPolicy.QUESTION_MISMATCH, help="overrides the import policy of settings.json")
+    parser.add_argument('--missing-names', choices=ImportPolicy.MISSING_NAMES, help="overrides the import policy of settings.json")
+    parser.add_argument('--merge', choices=ImportPolicy.MERGE, help="overrides the import policy of settings.json")
+    parser.add_argument('--to-sqlite', action='store_true',
+                        help="copy roster.csv, questions.csv, settings.json and results.csv into grading.sqlite before watching")
+    parser.add_argument('--from-sqlite', action='store_true',
+                        help="rewrite roster.csv, questions.csv, settings.json and results.csv from grading.sqlite first")
+    parser.add_argument('--set-score', nargs=3, metavar=('EMAIL', 'QUESTION', 'SCORE'),
+                        help="set a score in grading.sqlite (QUESTION is a UID such as Q3), rewrite results.csv and exit")
+    args = parser.parse_args()
+
+    folder_path = args.folder_path
+    online_csvs = []
+    for pattern in args.online_csvs:
+        if any(character in pattern for character in '*?['):
+            # A file whose name contains these characters is used as it is if nothing matches
+            online_csvs.extend(sorted(glob.glob(pattern)) or ([pattern] if os.path.exists(pattern) else []))
+        else:
+            online_csvs.append(pattern)
+    batch = args.batch
 
     roster_file = os.path.join(folder_path, "roster.csv")
     questions_file = os.path.join(folder_path, "questions.csv")
@@ -1182,8 +2552,31 @@ def main():
 
     class_name = "Class"
     evaluation_name = "Evaluation"
+    folder = GradingFolder(folder_path, class_name, evaluation_name)
+
+    if args.set_score or args.from_sqlite:
+        if not os.path.exists(folder.store_file):
+            print(f"No SQLite store '{folder.store_file}'. Create it with --to-sqlite first.")
+            sys.exit(1)
+        store = GradingStore(folder.store_file)
+        try:
+            if args.set_score:
+                email, question_uid, score = args.set_score
+                try:
+                    store.set_score(email, question_uid, float(score), folder)
+                except ValueError as e:
+                    print(f"Could not set the score: {e}")
+                    sys.exit(1)
+                print(f"Score of {email} for {question_uid} set to {float(score)} and saved to {results_file}")
+                return
+            store.export_folder(folder)
+            print(f"Grading files rewritten from {folder.store_file}")
+        finally:
+            store.close()
 
     def ask_yes_no(prompt_text: str) -> bool:
+        if batch:
+            return False
         try:
             resp = input(prompt_text + ' [y/N]: ').strip().lower()
         except EOFError:
@@ -1206,6 +2599,9 @@ def main():
     # If something's missing, propose to initialize (ask for consent)
     if missing:
         print("Detected missing or incomplete data:", ", ".join(missing))
+        if batch:
+            print("Run the program without --batch to initialize the folder. Exiting.")
+            sys.exit(1)
         if ask_yes_no("Initialize the folder and create sample files?"):
             # Create folder if needed
             if not os.path.exists(folder_path):
@@ -1233,15 +2629,23 @@ def main():
             print("Initialization declined. Exiting.")
             sys.exit(0)
 
-    # If an online CSV was provided, ask confirmation and import it (this will overwrite results.csv)
-    if online_csv:
-        online_csv_path = os.path.abspath(online_csv)
-        if not os.path.isfile(online_csv_path):
-            print(f"Online export file not found: {online_csv_path}")
-            sys.exit(1)
+    if args.online_csvs and not online_csvs:
+        print(f"No online export matches {', '.join(args.online_csvs)}")
+        sys.exit(1)
+
+    # If online CSVs were provided, ask confirmation and import them (this will overwrite results.csv)
+    if online_csvs:
+        online_csv_paths = [os.path.abspath(online_csv) for online_csv in online_csvs]
+        for online_csv_path in online_csv_paths:
+            if not os.path.isfile(online_csv_path):
+                print(f"Online export file not found: {online_csv_path}")
+                sys.exit(1)
 
-        prompt = f"Import online export '{online_csv_path}' into '{results_file}'? This will overwrite results.csv. Proceed?"
-        if ask_yes_no(prompt):
+        if len(online_csv_paths) == 1:
+            prompt = f"Import online export '{online_csv_paths[0]}' into '{results_file}'? This will overwrite results.csv. Proceed?"
+        else:
+            prompt = f"Import {len(online_csv_paths)} online exports ({', '.join(online_csv_paths)}) into '{results_file}'? This will overwrite results.csv. Proceed?"
+        if batch or ask_yes_no(prompt):
             # Ensure roster/questions exist before importing
             if not os.path.exists(roster_file) or not os.path.exists(questions_file):
                 print("roster.csv or questions.csv missing in the provided folder. Cannot import. Aborting.")
@@ -1251,7 +2655,23 @@ def main():
             evaluation = Evaluation.from_csv(evaluation_name, questions_file)
             settings = GlobalSettings.from_json(settings_file) if os.path.exists(settings_file) else GlobalSettings.default
 
-            import_online_csv_to_results(online_csv_path, results_file, roster_file, questions_file, class_, evaluation, settings)
+            # Command-line options override the import policy of settings.json
+            policy = ImportPolicy(
+                unknown_students=args.unknown_students or settings.import_policy.unknown_students,
+                question_mismatch=args.question_mismatch or settings.import_policy.question_mismatch,
+                missing_names=args.missing_names or settings.import_policy.missing_names,
+                merge=args.merge or settings.import_policy.merge
+            )
+            if batch:
+                policy = policy.non_interactive()
+
+            try:
+                import_online_csvs_to_results(online_csv_paths, results_file, roster_file, questions_file, class_, evaluation, settings, policy)
+            except ValueError as e:
+                if not batch:
+                    raise
+                print(f"Import failed: {e}")
+                sys.exit(1)
         else:
             print("Import skipped by user.")
 
@@ -1263,38 +2683,26 @@ def main():
 
     def results_match_roster_and_questions(class_, evaluation, settings, results_path):
         # Expected question uids based on active questions
-        active_indices = [i for i in range(len(evaluation.questions)) if (i + 1) not in getattr(settings, 'dropped_questions', [])]
-        expected_uids = [evaluation.get_question_uid(i) for i in active_indices]
+        active_indices = evaluation.active_question_indices(getattr(settings, 'dropped_questions', []))
+        expected_uids = [evaluation.question_uids[i] for i in active_indices]
 
         try:
-            with open(results_path, mode='r', newline='', encoding='utf-8') as csvfile:
-                reader = csv.reader(csvfile)
-                # Ensure there are at least three rows (part, title, header)
-                part = next(reader, None)
-                title = next(reader, None)
-                header = next(reader, None)
-                if header is None:
-                    return False, 'results file header is missing or too short'
-                # header expected: ['email', 'Q1', 'Q2', ...] but may include only active questions
-                header_uids = header[1:]
-
-                if header_uids != expected_uids:
-                    return False, f"question columns mismatch. expected: {expected_uids}, found: {header_uids}"
-
-                # collect emails from results body
-                result_emails = []
-                for row in reader:
-                    if len(row) > 0:
-                        result_emails.append(row[0])
-
-                roster_emails = [s.email for s in class_.students]
-                if set(result_emails) != set(roster_emails):
-                    return False, f"student emails mismatch. roster: {roster_emails}, results: {result_emails}"
-
-                return True, ''
+            # Parsed once here; the watcher then loads it from the cache
+            table = ResultsTable.from_csv(results_path)
         except Exception as e:
             return False, f'error reading results file: {e}'
 
+        # header expected: ['email', 'Q1', 'Q2', ...] but may include only active questions
+        if table.question_uids != expected_uids:
+            return False, f"question columns mismatch. expected: {expected_uids}, found: {table.question_uids}"
+
+        # Same emails: as many distinct ones, all on the roster
+        if len(table.row_index) != len(class_.email_index) or not all(class_.has_student(email) for email in table.row_index):
+            roster_emails = [s.email for s in class_.students]
+            return False, f"student emails mismatch. roster: {roster_emails}, results: {table.emails}"
+
+        return True, ''
+
     # Load class/evaluation/settings to perform matching
     class_ = Class.from_csv(class_name, roster_file)
     evaluation = Evaluation.from_csv(evaluation_name, questions_file)
@@ -1303,6 +2711,9 @@ def main():
     ok, reason = results_match_roster_and_questions(class_, evaluation, settings, results_file)
     if not ok:
         print(f"Mismatch detected between results.csv and roster/questions: {reason}")
+        if batch:
+            print("Run the program without --batch to re-initialize results.csv. Exiting.")
+            sys.exit(1)
         if ask_yes_no("Re-initialize results.csv to match the current roster/questions? This will overwrite results.csv."):
             results = Results(class_, evaluation, settings)
             results.write_results_to_csv(results_file)
@@ -1310,54 +2721,69 @@ def main():
         else:
             print("Keeping existing results.csv. Proceeding to watch (may produce errors).")
 
+    if args.to_sqlite:
+        store = GradingStore(folder.store_file)
+        try:
+            store.import_folder(folder)
+        finally:
+            store.close()
+        print(f"Grading files copied to {folder.store_file}")
+
+    if batch:
+        # Regenerate the outputs once instead of watching
+        folder.reload()
+        folder.write_outputs()
+        print(f"Plots updated and saved to {plots_file}")
+        return
+
     print(f"Watching for changes in {results_file}, {roster_file}, {questions_file} and {settings_file}...")
-    last_modified_times = {
-        'results': os.path.getmtime(results_file),
-        'roster': os.path.getmtime(roster_file),
-        'questions': os.path.getmtime(questions_file),
-        'settings': os.path.getmtime(settings_file)
-    }
+    folder.start_watching()
+    # Both PDFs and the stats CSV are written concurrently
+    executor = ProcessPoolExecutor(max_workers=3)
+    last_modified_times = folder.modified_times()
+    # Version of folder.journal whose changes were reported
+    reported_version = 0
 
     try:
-        first_run = True
+        # The first run loads every file, later runs only reload what changed
+        changed = set(FILE_TYPES)
         while True:
-            current_modified_times = {
-                'results': os.path.getmtime(results_file),
-                'roster': os.path.getmtime(roster_file),
-                'questions': os.path.getmtime(questions_file),
-                'settings': os.path.getmtime(settings_file)
-            }
-
-            settings = GlobalSettings.from_json(settings_file)
-
-            for file_type, last_modified_time in last_modified_times.items():
-                if current_modified_times[file_type] == last_modified_time and not first_run:
-                    continue
-
-                first_run = False
-
-                print(f"{file_type.capitalize()} file has been updated (was {last_modified_time}, now {current_modified_times[file_type]})")
-
-                # Reload class or evaluation if necessary
-                if file_type == 'roster':
-                    class_ = Class.from_csv(class_name, roster_file)
-                elif file_type == 'questions':
-                    evaluation = Evaluation.from_csv(evaluation_name, questions_file)
-
-                # Reload results and update plots
-                results = Results.read_results_from_csv(results_file, class_, evaluation, settings)
-                results.plot_all_statistics(plots_file)
-                anonym_plots_file = os.path.splitext(plots_file)[0] + '_anonym' + os.path.splitext(plots_file)[1]
-                results.plot_all_statistics(anonym_plots_file, show_individual=False)
-                results.write_results_with_stats(os.path.splitext(results_file)[0] + '_with_stats' + os.path.splitext(results_file)[1])
-                print(f"Plots updated and saved to {plots_file}")
-
-                # Update the last modified time
-                last_modified_times[file_type] = current_modified_times[file_type]
-
-            time.sleep(0.5)
+            try:
+                folder.reload(changed)
+            except Exception as e:
+                # Typically a file saved in place and read while half-written: keep the
+                # previous outputs and reload everything on the next change
+                print(f"Could not reload {', '.join(sorted(changed))}: {e}")
+                folder.results = None
+            else:
+                if folder.modified_times() != last_modified_times:
+                    # Written again while being read: what was read may be incomplete
+                    print("Files changed while being read, waiting for them to settle...")
+                else:
+                    if folder.changed_students is not None and 'results' in changed:
+                        print(f"Scores changed for {len(folder.changed_students)} student(s) in {len(folder.changed_questions)} question(s)")
+                    cells = folder.journal.changes_since(reported_version)
+                    for email, question_uid, old, new in (cells or [])[:REPORTED_CHANGES]:
+                        print(f"  {email} {question_uid}: {old} -> {new}")
+                    if cells and len(cells) > REPORTED_CHANGES:
+                        print(f"  ... and {len(cells) - REPORTED_CHANGES} other change(s)")
+                    reported_version = folder.journal.version
+                    folder.write_outputs(executor)
+                    print(f"Plots updated and saved to {plots_file}")
+
+            # Wait for the next batch of changes and regenerate once for all of them
+            changed, current_modified_times = folder.wait_for_changes(last_modified_times)
+            for file_type in FILE_TYPES:
+                if file_type in changed:
+                    print(f"{file_type.capitalize()} file has been updated (was {last_modified_times[file_type]}, now {current_modified_times[file_type]})")
+            last_modified_times = current_modified_times
+            if folder.results is None:
+                changed = set(FILE_TYPES)
     except KeyboardInterrupt:
         print("\nStopped watching.")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        folder.stop_watching()
 
 
 if __name__ == "__main__":